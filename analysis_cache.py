@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+import time
+
+from sqlite_storage import connect
+
+# --- CACHE PERSISTENTE DELLE ANALISI PLAYLIST (SQLITE) ---
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "analysis_cache.sqlite")
+DEFAULT_TTL_SECONDS = 24 * 60 * 60 # Un giorno
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024 # 200 MB di payload complessivo
+
+
+class AnalysisCache:
+    """Cache su disco delle analisi playlist, indicizzata per ID playlist e `snapshot_id`.
+
+    Una voce è valida solo se lo `snapshot_id` corrente coincide con quello salvato e
+    non è scaduta. Oltre `max_bytes` vengono rimosse le voci usate meno di recente (LRU).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        with connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS playlist_cache (
+                    playlist_id TEXT PRIMARY KEY,
+                    snapshot_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_playlist_cache_access ON playlist_cache (last_access)")
+
+    def get(self, playlist_id, snapshot_id):
+        """Restituisce il risultato salvato, o None se assente, scaduto o di uno snapshot diverso."""
+        now = time.time()
+        with self._lock, connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT snapshot_id, payload, created_at FROM playlist_cache WHERE playlist_id = ?",
+                (playlist_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            cached_snapshot, payload, created_at = row
+            if cached_snapshot != snapshot_id or now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM playlist_cache WHERE playlist_id = ?", (playlist_id,))
+                return None
+            conn.execute("UPDATE playlist_cache SET last_access = ? WHERE playlist_id = ?", (now, playlist_id))
+        return json.loads(payload)
+
+    def put(self, playlist_id, snapshot_id, result):
+        """Salva (o sostituisce) il risultato della playlist e applica TTL ed evizione LRU."""
+        payload = json.dumps(result, separators=(",", ":"))
+        now = time.time()
+        with self._lock, connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO playlist_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (playlist_id, snapshot_id, payload, len(payload), now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM playlist_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        total_bytes = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM playlist_cache").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+        # Rimuove le voci meno recenti finché il totale non rientra nel limite
+        victims = []
+        for playlist_id, size_bytes in conn.execute(
+            "SELECT playlist_id, size_bytes FROM playlist_cache ORDER BY last_access ASC"
+        ):
+            if total_bytes <= self.max_bytes:
+                break
+            victims.append((playlist_id,))
+            total_bytes -= size_bytes
+        conn.executemany("DELETE FROM playlist_cache WHERE playlist_id = ?", victims)
+
+    def clear(self):
+        with self._lock, connect(self.path) as conn:
+            conn.execute("DELETE FROM playlist_cache")
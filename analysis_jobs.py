@@ -0,0 +1,182 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from analyzer import iter_analysis_data, playlist_id_from_identifier
+from artist_cache import parse_artist_identifier
+from result_store import get_result_store
+
+# --- CODA DI ANALISI IN BACKGROUND CON DEDUPLICAZIONE DELLE RICHIESTE IDENTICHE ---
+
+DEFAULT_JOB_WORKERS = 4 # Analisi eseguite in parallelo dal processo
+DEFAULT_RETENTION_SECONDS = 5 * 60 # Per quanto un'analisi completata viene riusata da chi arriva dopo
+
+
+def analysis_key(analysis_type, identifier):
+    """Chiave di deduplicazione: tipo di analisi e identificatore normalizzato.
+
+    URL, URI e ID della stessa playlist (o dello stesso artista) producono la stessa chiave.
+    """
+    if analysis_type == "Playlist":
+        return analysis_type, playlist_id_from_identifier(identifier)
+    return (analysis_type,) + parse_artist_identifier(identifier)
+
+
+class AnalysisJob:
+    """Handle di un'analisi in esecuzione, condiviso da tutte le sessioni che l'hanno richiesta.
+
+    `poll` restituisce l'ultimo aggiornamento (parziale o finale) con un numero di versione
+    crescente, così ogni sessione segue l'avanzamento al proprio ritmo. L'aggiornamento
+    finale è {"result_id": ID nel ResultStore} oppure un dict con "error": il job non
+    trattiene il risultato completo.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.job_id = uuid.uuid4().hex
+        self.status = "queued"
+        self.created_at = time.time()
+        self.finished_at = None
+        self.subscribers = 1
+        self._update = None
+        self._version = 0
+        self._listeners = []
+        self._condition = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ("done", "error")
+
+    def _publish(self, update, status):
+        with self._condition:
+            self._update = update
+            self._version += 1
+            self.status = status
+            if status in ("done", "error"):
+                self.finished_at = time.time()
+            self._condition.notify_all()
+            listeners, version, done = list(self._listeners), self._version, self.done
+        for listener in listeners:
+            listener(version, update, done)
+
+    def add_listener(self, listener):
+        """Registra `listener(versione, aggiornamento, finito)`, chiamato dal thread del job a ogni aggiornamento.
+
+        Se c'è già un aggiornamento il listener viene chiamato subito con quello, così chi
+        arriva tardi non perde il risultato; le versioni possono arrivare fuori ordine. Serve a chi non può bloccare un thread in `poll`
+        (es. il servizio asyncio).
+        """
+        with self._condition:
+            self._listeners.append(listener)
+            current = (self._version, self._update, self.done) if self._version else None
+        if current is not None:
+            listener(*current)
+
+    def remove_listener(self, listener):
+        with self._condition:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def poll(self, last_version=0, timeout=None):
+        """Attende un aggiornamento più recente di `last_version`. Restituisce (versione, aggiornamento, finito)."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._version > last_version or self.done, timeout=timeout)
+            return self._version, self._update, self.done
+
+    def result(self, timeout=None):
+        """Attende la fine dell'analisi e restituisce {"result_id": ...} o il dict con "error"."""
+        with self._condition:
+            self._condition.wait_for(lambda: self.done, timeout=timeout)
+            return self._update if self.done else None
+
+
+class AnalysisJobManager:
+    """Esecutore di processo: le analisi girano fuori dal thread dello script Streamlit.
+
+    Le richieste con la stessa chiave (vedi analysis_key) mentre un'analisi è in corso, o
+    entro `retention_seconds` dal suo completamento, ricevono lo stesso AnalysisJob invece
+    di avviare un nuovo recupero. Le analisi fallite non vengono riusate. I risultati
+    completati vanno nel `result_store` (budget di memoria e scarico su disco).
+    """
+
+    def __init__(self, max_workers=DEFAULT_JOB_WORKERS, retention_seconds=DEFAULT_RETENTION_SECONDS,
+                 result_store=None):
+        self.retention_seconds = retention_seconds
+        self.result_store = result_store or get_result_store()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.deduplicated = 0
+
+    def submit(self, analysis_type, identifier, client_id, client_secret, **analysis_options):
+        """Avvia l'analisi o si unisce a quella identica già in corso. Restituisce l'AnalysisJob.
+
+        `analysis_options` viene passato a iter_analysis_data (cache, pool_size, ...).
+        """
+        key = analysis_key(analysis_type, identifier) + (client_id,)
+        with self._lock:
+            self._prune(time.time())
+            job = self._jobs.get(key)
+            if job is not None:
+                job.subscribers += 1
+                self.deduplicated += 1
+                return job
+            job = AnalysisJob(key)
+            self._jobs[key] = job
+            self.submitted += 1
+        self._executor.submit(self._run, job, analysis_type, identifier, client_id, client_secret, analysis_options)
+        return job
+
+    def _run(self, job, analysis_type, identifier, client_id, client_secret, analysis_options):
+        job.status = "running"
+        update = None
+        try:
+            for update in iter_analysis_data(analysis_type, identifier, client_id, client_secret, **analysis_options):
+                if update.get('partial'):
+                    job._publish(update, "running")
+        except Exception as e:
+            update = {"error": f"Errore imprevisto durante l'analisi: {e}"}
+        if update is None or "error" in update:
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+            job._publish(update or {"error": "Analisi terminata senza risultato."}, "error")
+        else:
+            # Il risultato completo entra nel budget dell'archivio; il job conserva solo l'ID
+            job._publish({"result_id": self.result_store.put(job.job_id, update)}, "done")
+        # I job scaduti vengono rimossi anche se non arrivano nuove richieste
+        with self._lock:
+            self._prune(time.time())
+
+    def _prune(self, now):
+        expired = [
+            key for key, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.retention_seconds
+        ]
+        for key in expired:
+            del self._jobs[key]
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if not job.done)
+            return {
+                "running": running,
+                "retained": len(self._jobs) - running,
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+            }
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """Esecutore unico del processo, condiviso da tutte le sessioni."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = AnalysisJobManager()
+        return _manager
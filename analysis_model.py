@@ -0,0 +1,239 @@
+import numpy as np
+import pandas as pd
+
+from duplicate_index import (
+    RULE_ISRC, RULE_TITLE_ARTIST, RULE_TRACK_ID, DuplicateIndex, normalize_isrc, normalize_title_artist
+)
+
+# --- MODELLO COLONNARE DEI RISULTATI (PANDAS/NUMPY) ---
+
+LOW_SCORE_THRESHOLD = 20 # Sotto questa soglia il brano è considerato a rischio
+LIVE_LOW_TRACKS_SHOWN = 10 # Ultimi brani a rischio pubblicati negli aggiornamenti parziali
+
+# Soglie inferiori delle fasce 2-9 usate da get_score_classes (fascia 1: 0-11)
+SCORE_BAND_EDGES = np.array([12, 23, 34, 45, 56, 67, 78, 90])
+SCORE_BAND_LABELS = [
+    f"{low}-{high}" for low, high in zip([0, *SCORE_BAND_EDGES.tolist()], [*(SCORE_BAND_EDGES - 1).tolist(), 100])
+]
+
+TRACK_COLUMNS = ["position", "name", "artist", "score", "is_duplicate", "duplicate_rule"]
+
+
+def track_row(position, track):
+    """Record compatto di un brano: (posizione, ID, titolo, artista principale, popolarità, ISRC)."""
+    return (
+        position,
+        track['id'],
+        track['name'],
+        track['artists'][0]['name'],
+        track['popularity'],
+        (track.get('external_ids') or {}).get('isrc'),
+    )
+
+
+def classify_score_bands(scores):
+    """Restituisce la fascia (1-9) di ogni score, con una sola ricerca binaria vettoriale."""
+    return np.searchsorted(SCORE_BAND_EDGES, np.asarray(scores), side="right") + 1
+
+
+def detect_duplicates(track_ids, isrcs=None, title_keys=None):
+    """Maschera dei duplicati e regola che li ha individuati, con una passata hash per chiave.
+
+    Un brano è duplicato se un brano precedente ha lo stesso ID, lo stesso ISRC o la stessa
+    chiave titolo/artista normalizzata; la prima occorrenza non è mai duplicata. Le chiavi
+    mancanti non corrispondono a nulla.
+    """
+    masks = [(RULE_TRACK_ID, pd.Series(track_ids, dtype=object).duplicated(keep="first").to_numpy())]
+    for rule, keys in ((RULE_ISRC, isrcs), (RULE_TITLE_ARTIST, title_keys)):
+        if keys is not None:
+            keys = pd.Series(keys, dtype=object)
+            masks.append((rule, (keys.notna() & keys.duplicated(keep="first")).to_numpy()))
+
+    rules = np.full(len(masks[0][1]), None, dtype=object)
+    # Ordine inverso: la regola con precedenza più alta sovrascrive le altre
+    for rule, mask in reversed(masks):
+        rules[mask] = rule
+    is_duplicate = np.logical_or.reduce([mask for _, mask in masks])
+    return is_duplicate, rules
+
+
+def build_track_frame(positions, track_ids, names, artists, scores, isrcs=None, title_keys=None):
+    """Costruisce la tabella dei brani a partire da colonne parallele.
+
+    Aggiunge in un solo passaggio la maschera dei duplicati (vedi detect_duplicates) e
+    la maschera dei brani a bassa popolarità.
+    """
+    frame = pd.DataFrame({
+        "position": np.asarray(positions, dtype=np.int32),
+        "track_id": pd.Series(track_ids, dtype=object),
+        "name": pd.Series(names, dtype=object),
+        "artist": pd.Series(artists, dtype=object),
+        "score": np.asarray(scores, dtype=np.int16),
+    })
+    is_duplicate, duplicate_rules = detect_duplicates(track_ids, isrcs, title_keys)
+    frame["is_duplicate"] = is_duplicate
+    frame["duplicate_rule"] = pd.Series(duplicate_rules, dtype=object) # None se non duplicato
+    frame["is_low"] = frame["score"].to_numpy() < LOW_SCORE_THRESHOLD
+    return frame
+
+
+def compute_metrics(frame):
+    """Calcola le metriche aggregate dell'analisi sulle colonne della tabella."""
+    total_tracks = len(frame)
+    scores = frame["score"].to_numpy(dtype=np.int64)
+    return {
+        "avg_pop": int(scores.sum() / total_tracks) if total_tracks else 0,
+        "total_duplicates": int(frame["is_duplicate"].sum()),
+        "duplicate_rule_counts": {
+            rule: int(count) for rule, count in frame["duplicate_rule"].value_counts().items()
+        },
+        "total_tracks": total_tracks,
+        "low_score_count": int(frame["is_low"].sum()),
+    }
+
+
+def frame_to_records(frame):
+    """Converte la tabella nella lista di dizionari usata dalla UI."""
+    return frame[TRACK_COLUMNS].to_dict("records")
+
+
+# --- DISTRIBUZIONE DEGLI SCORE: SKETCH COMBINABILE ---
+
+MAX_SCORE = 100
+# Fascia di ogni score possibile (indice = score), per derivare l'istogramma delle fasce
+_BANDS_BY_SCORE = classify_score_bands(np.arange(MAX_SCORE + 1))
+
+
+class ScoreSketch:
+    """Riepilogo della distribuzione degli score aggiornabile brano per brano e combinabile.
+
+    La popolarità è un intero 0-100: il riepilogo è il conteggio per ciascun valore
+    (101 interi), quindi percentili, media e deviazione standard sono esatti e due sketch
+    si combinano sommando i conteggi, senza rileggere i brani.
+    """
+
+    def __init__(self, counts=None):
+        self.counts = list(counts) if counts is not None else [0] * (MAX_SCORE + 1)
+
+    @classmethod
+    def from_scores(cls, scores):
+        return cls(np.bincount(np.asarray(scores, dtype=np.int64), minlength=MAX_SCORE + 1).tolist())
+
+    @classmethod
+    def merged(cls, sketches):
+        """Combina più sketch (es. tutte le playlist di un curatore)."""
+        total = cls()
+        for sketch in sketches:
+            total.merge(sketch)
+        return total
+
+    def add(self, score):
+        self.counts[score] += 1
+
+    def merge(self, other):
+        counts = self.counts
+        for score, count in enumerate(other.counts):
+            counts[score] += count
+        return self
+
+    def percentile(self, q, counts=None):
+        """Percentile `q` (0-100) con il metodo nearest-rank; None se lo sketch è vuoto."""
+        counts = np.asarray(self.counts) if counts is None else counts
+        total = int(counts.sum())
+        if not total:
+            return None
+        rank = max(1, int(np.ceil(q / 100 * total)))
+        return int(np.searchsorted(np.cumsum(counts), rank))
+
+    def summary(self):
+        """Numero di brani, media, deviazione standard, p10/mediana/p90 e brani per fascia (1-9)."""
+        counts = np.asarray(self.counts, dtype=np.int64)
+        total = int(counts.sum())
+        values = np.arange(MAX_SCORE + 1)
+        mean = float(values @ counts) / total if total else 0.0
+        variance = float(((values - mean) ** 2) @ counts) / total if total else 0.0
+        return {
+            "count": total,
+            "mean": round(mean, 2),
+            "std": round(variance ** 0.5, 2),
+            "p10": self.percentile(10, counts),
+            "median": self.percentile(50, counts),
+            "p90": self.percentile(90, counts),
+            "band_counts": np.bincount(_BANDS_BY_SCORE, weights=counts, minlength=10)[1:].astype(int).tolist(),
+        }
+
+    def to_list(self):
+        return list(self.counts)
+
+
+class RunningTrackStats:
+    """Accumula i brani pagina per pagina mantenendo solo colonne compatte.
+
+    Media, duplicati e brani a bassa popolarità sono aggiornati a ogni pagina, così
+    i risultati parziali sono disponibili senza conservare i payload grezzi dell'API.
+    """
+
+    def __init__(self):
+        self.positions = []
+        self.track_ids = []
+        self.names = []
+        self.artists = []
+        self.scores = []
+        self.isrcs = []
+        self.title_keys = []
+        self.score_sum = 0
+        self.total_duplicates = 0
+        self.low_tracks = []
+        self.sketch = ScoreSketch()
+        self._duplicates = DuplicateIndex()
+
+    def add_tracks(self, valid_tracks):
+        """Aggiunge una pagina di brani validi, come coppie (posizione, oggetto track)."""
+        self.add_rows(track_row(position, track) for position, track in valid_tracks)
+
+    def add_rows(self, rows):
+        """Aggiunge una pagina di brani come record compatti (vedi track_row)."""
+        duplicates = self._duplicates
+        score_counts = self.sketch.counts
+        for position, track_id, name, artist, score, isrc in rows:
+            isrc = normalize_isrc(isrc)
+            title_key = normalize_title_artist(name, artist)
+            duplicate_rule = duplicates.check_and_add(track_id, isrc, title_key)
+            self.positions.append(position)
+            self.track_ids.append(track_id)
+            self.names.append(name)
+            self.artists.append(artist)
+            self.scores.append(score)
+            self.isrcs.append(isrc)
+            self.title_keys.append(title_key)
+            self.score_sum += score
+            score_counts[score] += 1 # Come self.sketch.add, senza la chiamata per brano
+            self.total_duplicates += duplicate_rule is not None
+            if score < LOW_SCORE_THRESHOLD:
+                self.low_tracks.append({
+                    "position": position,
+                    "name": name,
+                    "artist": artist,
+                    "score": score,
+                    "is_duplicate": duplicate_rule is not None,
+                    "duplicate_rule": duplicate_rule,
+                })
+
+    def snapshot(self):
+        """Metriche parziali correnti.
+
+        Dei brani a rischio pubblica il conteggio e una copia degli ultimi trovati: la lista
+        completa continua a crescere nel thread dell'analisi mentre l'interfaccia la legge.
+        """
+        count = len(self.scores)
+        return {
+            "processed_tracks": count,
+            "avg_pop": int(self.score_sum / count) if count else 0,
+            "total_duplicates": self.total_duplicates,
+            "low_score_count": len(self.low_tracks),
+            "recent_low_tracks": self.low_tracks[-LIVE_LOW_TRACKS_SHOWN:],
+        }
+
+    def to_frame(self):
+        return build_track_frame(self.positions, self.track_ids, self.names, self.artists, self.scores,
+                                 isrcs=self.isrcs, title_keys=self.title_keys)
@@ -0,0 +1,455 @@
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from spotipy.exceptions import SpotifyException
+
+from analysis_model import RunningTrackStats, compute_metrics, frame_to_records, track_row
+from artist_cache import parse_artist_identifier
+from duplicate_index import DuplicateIndex, normalize_isrc, normalize_title_artist
+from instrumentation import AnalysisMetrics, log_analysis
+from lean_fetch import LEGACY_PLAYLIST_ITEMS_FIELDS, fetch_playlist_page, page_rows
+from spotify_client import DEFAULT_POOL_SIZE, get_spotify_client
+
+# --- FUNZIONE BACKEND UNIFICATA (SENZA DIPENDENZE DA STREAMLIT) ---
+
+# Numero massimo di ID accettati da una singola chiamata sp.tracks (limite API Spotify)
+TRACKS_BATCH_SIZE = 50
+
+def _fetch_tracks_batched(sp, track_ids):
+    """Recupera i brani in blocchi da TRACKS_BATCH_SIZE ID. Restituisce (brani, chiamate API)."""
+    tracks = []
+    api_calls = 0
+    for start in range(0, len(track_ids), TRACKS_BATCH_SIZE):
+        batch = track_ids[start:start + TRACKS_BATCH_SIZE]
+        tracks.extend(sp.tracks(batch)['tracks'])
+        api_calls += 1
+    return tracks, api_calls
+
+def playlist_id_from_identifier(identifier):
+    """ID della playlist da URL, URI (spotify:playlist:ID) o ID semplice."""
+    identifier = identifier.strip()
+    if identifier.startswith("spotify:playlist:"):
+        return identifier.split(":")[-1]
+    # Pulizia URL per ottenere ID
+    return identifier.split("/")[-1].split("?")[0]
+
+def _resolve_artist(sp, identifier, artist_cache=None):
+    """Risolve nome, URL o URI nell'artista Spotify con al massimo una richiesta.
+
+    L'input viene classificato prima di qualsiasi chiamata: gli ID vanno a `sp.artist`, i
+    nomi a `sp.search`. Restituisce (artista, chiamate API), con artista None se non trovato.
+    """
+    kind, value = parse_artist_identifier(identifier)
+    if kind == "invalid":
+        return None, 0
+    if artist_cache is not None:
+        cached = artist_cache.get(kind, value)
+        if cached is not None:
+            return cached, 0
+
+    if kind == "id":
+        try:
+            artist = sp.artist(value)
+        except SpotifyException as e:
+            if e.http_status in (400, 404):
+                return None, 1
+            raise
+        name_key = None
+    else:
+        items = sp.search(q='artist:' + identifier.strip(), type='artist')['artists']['items']
+        if not items:
+            return None, 1
+        artist = items[0]
+        name_key = value
+    if artist_cache is not None:
+        artist_cache.put(artist, name_key)
+    return artist, 1
+
+# Paginazione playlist: dimensione massima di pagina e numero di richieste simultanee
+PLAYLIST_PAGE_SIZE = 100
+PLAYLIST_PAGE_WORKERS = 8
+# Versione del formato dei risultati in cache: cambiandola, le voci salvate prima non vengono più lette
+CACHE_RESULT_VERSION = 5
+
+def _iter_playlist_pages(sp, playlist_id, parallel_pages=True, metrics=None, lean=True):
+    """Genera le pagine della playlist in ordine, come terne (offset, elementi ricevuti, record compatti).
+
+    In modalità parallela la prima pagina fornisce `total`; le pagine successive vengono
+    richieste per offset da un pool limitato. Al massimo 2 * PLAYLIST_PAGE_WORKERS pagine
+    sono in volo o in attesa di essere consumate, così la memoria resta limitata.
+    Le richieste dei thread del pool vengono attribuite a `metrics`, se indicato.
+
+    Con `lean` le pagine usano la proiezione minima dei campi e la decodifica di lean_fetch;
+    altrimenti passano da spotipy con gli oggetti artista completi (formato precedente).
+    """
+    def fetch_page(offset):
+        if lean:
+            return fetch_playlist_page(sp, playlist_id, offset, PLAYLIST_PAGE_SIZE)
+        page = sp.playlist_items(playlist_id, fields=LEGACY_PLAYLIST_ITEMS_FIELDS, limit=PLAYLIST_PAGE_SIZE, offset=offset)
+        return len(page['items']), page_rows(page['items'], offset), page
+
+    item_count, rows, first_page = fetch_page(0)
+    yield 0, item_count, rows
+
+    if not parallel_pages:
+        page, offset = first_page, 0
+        while page.get('next'):
+            offset += len(page['items'])
+            if lean:
+                # Per offset e non tramite `next`, che non riporta il parametro `fields`
+                item_count, rows, page = fetch_page(offset)
+            else:
+                page = sp.next(page)
+                item_count, rows = len(page['items']), page_rows(page['items'], offset)
+            yield offset, item_count, rows
+        return
+
+    total = first_page.get('total') or 0
+    offsets = list(range(PLAYLIST_PAGE_SIZE, total, PLAYLIST_PAGE_SIZE))
+    if not offsets:
+        return
+
+    def fetch_page_bound(offset):
+        if metrics is not None:
+            with metrics.bind():
+                return fetch_page(offset)[:2]
+        return fetch_page(offset)[:2]
+
+    remaining = iter(offsets)
+    with ThreadPoolExecutor(max_workers=min(PLAYLIST_PAGE_WORKERS, len(offsets))) as executor:
+        pending = deque(
+            (offset, executor.submit(fetch_page_bound, offset))
+            for offset in itertools.islice(remaining, 2 * PLAYLIST_PAGE_WORKERS)
+        )
+        # Le pagine vengono restituite nell'ordine degli offset, non in quello di arrivo
+        while pending:
+            offset, future = pending.popleft()
+            item_count, rows = future.result()
+            for next_offset in itertools.islice(remaining, 1):
+                pending.append((next_offset, executor.submit(fetch_page_bound, next_offset)))
+            yield offset, item_count, rows
+
+# Catalogo completo: album e singoli dell'artista, recuperati in parallelo
+CATALOG_INCLUDE_GROUPS = "album,single"
+ARTIST_ALBUMS_PAGE_SIZE = 50 # Massimo consentito da /artists/{id}/albums
+ALBUMS_BATCH_SIZE = 20 # Massimo di ID per una chiamata sp.albums
+ALBUM_TRACKS_PAGE_SIZE = 50
+CATALOG_WORKERS = 8
+
+def _bound(metrics, function):
+    """Avvolge `function` perché le richieste fatte dai thread del pool vadano a `metrics`."""
+    def wrapper(*args):
+        with metrics.bind():
+            return function(*args)
+    return wrapper
+
+def _album_track_ids(sp, album, artist_id):
+    """ID dei brani dell'album in cui compare l'artista. Restituisce (ID, chiamate API aggiuntive)."""
+    page = album['tracks']
+    track_ids = [t['id'] for t in page['items'] if t and t.get('id') and any(a.get('id') == artist_id for a in t['artists'])]
+    calls = 0
+    offset = len(page['items'])
+    # sp.albums include solo i primi 50 brani: i restanti (raro) si leggono a pagine
+    while page.get('next'):
+        page = sp.album_tracks(album['id'], limit=ALBUM_TRACKS_PAGE_SIZE, offset=offset)
+        calls += 1
+        offset += len(page['items'])
+        track_ids.extend(
+            t['id'] for t in page['items'] if t and t.get('id') and any(a.get('id') == artist_id for a in t['artists'])
+        )
+    return track_ids, calls
+
+def _iter_artist_catalog(sp, artist, api_calls, metrics):
+    """Analisi del catalogo completo (album e singoli) dell'artista, con risultati progressivi.
+
+    1. Elenco delle uscite: prima pagina, poi le altre in parallelo per offset.
+    2. Brani delle uscite: sp.albums a blocchi da ALBUMS_BATCH_SIZE, in parallelo.
+    3. Popolarità: sp.tracks a blocchi da TRACKS_BATCH_SIZE, in parallelo, con un
+       aggiornamento parziale per ogni blocco ricevuto.
+    Lo stesso brano pubblicato su più uscite (stesso ID o ISRC) viene contato una volta
+    sola, nella versione più popolare. Titolo e artista valgono solo per i brani senza
+    ISRC: registrazioni diverse con un titolo generico ("Intro", "Interlude") restano distinte.
+    """
+    artist_id = artist['id']
+    name = f"Catalogo completo di {artist['name']}"
+    image_url = artist['images'][0]['url'] if artist['images'] else None
+
+    def fetch_albums_page(offset):
+        return sp.artist_albums(artist_id, include_groups=CATALOG_INCLUDE_GROUPS, limit=ARTIST_ALBUMS_PAGE_SIZE,
+                                offset=offset)['items']
+
+    def fetch_albums(album_ids):
+        albums = sp.albums(album_ids)['albums']
+        track_ids, extra_calls = [], 0
+        for album in albums:
+            if album:
+                album_tracks, calls = _album_track_ids(sp, album, artist_id)
+                track_ids.extend(album_tracks)
+                extra_calls += calls
+        return track_ids, extra_calls + 1
+
+    with ThreadPoolExecutor(max_workers=CATALOG_WORKERS) as executor:
+        with metrics.stage("metadata"):
+            first_page = sp.artist_albums(artist_id, include_groups=CATALOG_INCLUDE_GROUPS, limit=ARTIST_ALBUMS_PAGE_SIZE)
+            api_calls += 1
+            releases = list(first_page['items'])
+            offsets = range(ARTIST_ALBUMS_PAGE_SIZE, first_page.get('total') or 0, ARTIST_ALBUMS_PAGE_SIZE)
+            for items in executor.map(_bound(metrics, fetch_albums_page), offsets):
+                releases.extend(items)
+                api_calls += 1
+            album_ids = list(dict.fromkeys(release['id'] for release in releases if release and release.get('id')))
+
+        with metrics.stage("track_lookup"):
+            album_batches = [album_ids[i:i + ALBUMS_BATCH_SIZE] for i in range(0, len(album_ids), ALBUMS_BATCH_SIZE)]
+            track_ids = []
+            for batch_track_ids, calls in executor.map(_bound(metrics, fetch_albums), album_batches):
+                track_ids.extend(batch_track_ids)
+                api_calls += calls
+            track_ids = list(dict.fromkeys(track_ids))
+
+        track_batches = [track_ids[i:i + TRACKS_BATCH_SIZE] for i in range(0, len(track_ids), TRACKS_BATCH_SIZE)]
+        fetched = executor.map(_bound(metrics, lambda ids: sp.tracks(ids)['tracks']), track_batches)
+        tracks = []
+        provisional = RunningTrackStats()
+        while True:
+            with metrics.stage("track_lookup"):
+                batch = next(fetched, None)
+            if batch is None:
+                break
+            api_calls += 1
+            batch = [t for t in batch if t and t.get('id') and t.get('popularity') is not None]
+            with metrics.stage("aggregation"):
+                provisional.add_tracks((len(tracks) + index + 1, track) for index, track in enumerate(batch))
+            tracks.extend(batch)
+            partial = provisional.snapshot()
+            partial.update({
+                "partial": True,
+                "name": name,
+                "image_url": image_url,
+                "fetched_items": len(tracks),
+                "expected_items": len(track_ids),
+                "api_calls": api_calls
+            })
+            yield partial
+
+    with metrics.stage("aggregation"):
+        # Dalla versione più popolare: le uscite successive dello stesso brano vengono scartate
+        tracks.sort(key=lambda t: t['popularity'], reverse=True)
+        releases_index = DuplicateIndex()
+        unique_tracks = []
+        for row in (track_row(0, t) for t in tracks):
+            _, track_id, track_name, track_artist, _, isrc = row
+            isrc = normalize_isrc(isrc)
+            title_key = None if isrc else normalize_title_artist(track_name, track_artist)
+            if releases_index.check_and_add(track_id, isrc, title_key) is None:
+                unique_tracks.append(row)
+        stats = RunningTrackStats()
+        stats.add_rows((position,) + row[1:] for position, row in enumerate(unique_tracks, start=1))
+        result = _analysis_result(name, image_url, stats, api_calls)
+        result.update({"releases": len(album_ids), "cross_release_duplicates": len(tracks) - len(unique_tracks)})
+    yield result
+
+def _analysis_result(name, image_url, stats, api_calls):
+    """Risultato finale dell'analisi: metriche vettoriali sulla tabella colonnare."""
+    frame = stats.to_frame()
+    summary = compute_metrics(frame)
+    return {
+        "name": name,
+        "avg_pop": summary['avg_pop'],
+        "all_tracks_data": frame_to_records(frame),
+        "total_tracks": summary['total_tracks'],
+        "image_url": image_url,
+        "total_duplicates": summary['total_duplicates'],
+        "duplicate_rule_counts": summary['duplicate_rule_counts'],
+        "low_score_count": summary['low_score_count'],
+        # Distribuzione calcolata durante la lettura dei brani; "score_sketch" si combina tra analisi
+        "distribution": stats.sketch.summary(),
+        "score_sketch": stats.sketch.to_list(),
+        "api_calls": api_calls,
+        "from_cache": False
+    }
+
+def iter_analysis_data(analysis_type, identifier, client_id, client_secret, parallel_pages=True, cache=None,
+                       pool_size=DEFAULT_POOL_SIZE, overlap_index=None, artist_cache=None, history=None):
+    """Esegue l'analisi unificata per Playlist, Artista o Catalogo Artista, producendo risultati progressivi.
+
+    Per le playlist genera un aggiornamento parziale (`"partial": True`) per ogni pagina
+    ricevuta, con popolarità media, duplicati e brani a bassa popolarità correnti.
+    L'ultimo elemento generato è sempre il risultato completo oppure un dict con "error";
+    entrambi contengono in "metrics" i tempi per fase e i contatori HTTP dell'analisi.
+
+    Se viene passata una `cache` (AnalysisCache), le playlist con lo stesso `snapshot_id`
+    dell'ultima analisi vengono restituite senza paginazione.
+    Se viene passato un `overlap_index` (OverlapIndex), le playlist analizzate vi vengono
+    registrate per il confronto con le altre; il risultato contiene "playlist_id".
+    Con un `artist_cache` (ArtistCache) nomi, URL e URI già risolti non richiedono chiamate.
+    Con una `history` (PopularityHistory) gli score dei brani delle playlist vengono
+    registrati nello storico, al massimo una volta per intervallo minimo dello storico.
+    """
+    metrics = AnalysisMetrics()
+    for update in _iter_analysis_steps(analysis_type, identifier, client_id, client_secret,
+                                       parallel_pages, cache, pool_size, overlap_index, artist_cache, history,
+                                       metrics):
+        if update.get('partial'):
+            yield update
+            continue
+        update["metrics"] = metrics.as_dict()
+        log_analysis(
+            analysis_type, identifier, metrics,
+            outcome="error" if "error" in update else ("cache" if update.get('from_cache') else "ok"),
+            total_tracks=update.get('total_tracks')
+        )
+        yield update
+
+def _iter_analysis_steps(analysis_type, identifier, client_id, client_secret, parallel_pages, cache, pool_size,
+                         overlap_index, artist_cache, history, metrics):
+    """Corpo di iter_analysis_data: ogni fase è misurata in `metrics`."""
+    
+    # Client condiviso dal processo: token e connessioni vengono riutilizzati tra le analisi
+    sp = get_spotify_client(client_id, client_secret, pool_size)
+    
+    api_calls = 0 # Conteggio delle richieste HTTP verso l'API Spotify
+    stats = RunningTrackStats()
+    
+    if analysis_type == "Playlist":
+        playlist_id = playlist_id_from_identifier(identifier)
+        
+        try:
+            # Il token è in cache finché non scade: qui si misura solo l'eventuale rinnovo
+            with metrics.stage("auth"):
+                sp.auth_manager.get_access_token(as_dict=False)
+
+            # 1. Ottieni i metadati della playlist (nome, immagine, totale brani)
+            with metrics.stage("metadata"):
+                metadata = sp.playlist(playlist_id, fields='name,images,snapshot_id,tracks.total')
+            api_calls += 1
+            name = metadata['name']
+            image_url = metadata['images'][0]['url'] if metadata['images'] else None
+            snapshot_id = metadata.get('snapshot_id')
+            expected_items = (metadata.get('tracks') or {}).get('total')
+
+            # Se la playlist non è cambiata dall'ultima analisi, usa il risultato salvato
+            cache_key = f"{snapshot_id}:v{CACHE_RESULT_VERSION}" if snapshot_id else None
+            # Il risultato in cache non contiene gli ID dei brani: se la playlist manca
+            # dall'indice di sovrapposizione, o è ora di registrarla nello storico (la
+            # popolarità cambia anche con lo stesso snapshot), la si rilegge
+            indexed = (
+                (overlap_index is None or overlap_index.contains(playlist_id, snapshot_id))
+                and (history is None or not history.is_due(playlist_id))
+            )
+            if cache is not None and cache_key and indexed:
+                with metrics.stage("cache"):
+                    cached = cache.get(playlist_id, cache_key)
+                if cached is not None:
+                    cached.update({"name": name, "image_url": image_url, "api_calls": api_calls, "from_cache": True,
+                                   "playlist_id": playlist_id})
+                    yield cached
+                    return
+
+            # 2. Processa le pagine man mano che arrivano: i payload grezzi non vengono conservati
+            #    (i local file e gli episodi rimossi non hanno ID e vengono saltati)
+            pages = _iter_playlist_pages(sp, playlist_id, parallel_pages, metrics)
+            while True:
+                with metrics.stage("pagination"):
+                    page = next(pages, None)
+                if page is None:
+                    break
+                offset, item_count, rows = page
+                api_calls += 1
+                with metrics.stage("aggregation"):
+                    stats.add_rows(rows)
+                partial = stats.snapshot()
+                partial.update({
+                    "partial": True,
+                    "name": name,
+                    "image_url": image_url,
+                    "fetched_items": offset + item_count,
+                    "expected_items": expected_items,
+                    "api_calls": api_calls
+                })
+                yield partial
+        except Exception as e:
+            yield {"error": f"ID/URL Playlist non valido o errore API: {e}"}
+            return
+
+        with metrics.stage("aggregation"):
+            result = _analysis_result(name, image_url, stats, api_calls)
+        result["playlist_id"] = playlist_id
+        if cache is not None and cache_key:
+            with metrics.stage("cache"):
+                cache.put(playlist_id, cache_key, result)
+        if overlap_index is not None:
+            with metrics.stage("indexing"):
+                overlap_index.add(playlist_id, name, snapshot_id, stats.track_ids)
+        if history is not None and history.is_due(playlist_id):
+            with metrics.stage("indexing"):
+                history.record(playlist_id, snapshot_id, stats.track_ids, stats.names, stats.artists, stats.scores,
+                               result['avg_pop'], result['total_tracks'])
+        yield result
+                
+    elif analysis_type in ("Artista", "Catalogo Artista"):
+        with metrics.stage("auth"):
+            sp.auth_manager.get_access_token(as_dict=False)
+
+        # 1. Trova l'artista (URL, URI o nome): al massimo una chiamata API, nessuna se in cache
+        try:
+            with metrics.stage("metadata"):
+                artist, resolve_calls = _resolve_artist(sp, identifier, artist_cache)
+        except Exception as e:
+            yield {"error": f"Errore API durante la ricerca dell'artista: {e}"}
+            return
+        api_calls += resolve_calls
+        if artist is None:
+            yield {"error": f"Artista non trovato con il nome o l'URL/ID fornito: {identifier}"}
+            return
+        artist_id = artist['id']
+
+        if analysis_type == "Catalogo Artista":
+            try:
+                yield from _iter_artist_catalog(sp, artist, api_calls, metrics)
+            except Exception as e:
+                yield {"error": f"Errore API durante il recupero del catalogo: {e}"}
+            return
+        
+        # 2. Ottieni i metadati
+        name = f"Top Tracks di {artist['name']}" # L'endpoint restituisce al massimo 10 brani
+        image_url = artist['images'][0]['url'] if artist['images'] else None
+        
+        # 3. RECUPERO TRACCE: Usa Top Tracks Globali per stabilità e rilevanza
+        with metrics.stage("track_lookup"):
+            top_tracks_results = sp.artist_top_tracks(artist_id)['tracks']
+        api_calls += 1
+        
+        # Le Top Tracks contengono già la popolarità: la richiesta di dettaglio serve solo
+        # per i brani che ne sono privi, ed è fatta a blocchi invece che un brano alla volta
+        missing_ids = [t['id'] for t in top_tracks_results if t and t.get('popularity') is None]
+        if missing_ids:
+            with metrics.stage("track_lookup"):
+                fetched, batch_calls = _fetch_tracks_batched(sp, missing_ids)
+            api_calls += batch_calls
+            fetched_by_id = {t['id']: t for t in fetched if t}
+        else:
+            fetched_by_id = {}
+        
+        tracks_list = []
+        for track in top_tracks_results:
+            if track and track.get('popularity') is None:
+                track = fetched_by_id.get(track['id'])
+            tracks_list.append(track)
+
+
+        with metrics.stage("aggregation"):
+            stats.add_tracks((index + 1, track) for index, track in enumerate(tracks_list) if track)
+            result = _analysis_result(name, image_url, stats, api_calls)
+        yield result
+
+def get_analysis_data(analysis_type, identifier, client_id, client_secret, parallel_pages=True, cache=None,
+                      pool_size=DEFAULT_POOL_SIZE, overlap_index=None, artist_cache=None, history=None):
+    """Esegue l'analisi unificata per Playlist, Artista o Catalogo Artista e restituisce solo il risultato finale."""
+    result = None
+    for result in iter_analysis_data(analysis_type, identifier, client_id, client_secret,
+                                     parallel_pages=parallel_pages, cache=cache, pool_size=pool_size,
+                                     overlap_index=overlap_index, artist_cache=artist_cache, history=history):
+        pass
+    return result
@@ -0,0 +1,300 @@
+"""Servizio HTTP con API JSON dell'analizzatore, senza interfaccia Streamlit.
+
+Esempio:
+    python api_service.py --port 8080 --cache analysis_cache.sqlite
+    curl "http://127.0.0.1:8080/analysis?type=playlist&id=37i9dQZF1DXcBWIGoYBM5M"
+    curl "http://127.0.0.1:8080/analysis/stream?type=catalog&id=Radiohead"
+
+Endpoint (solo GET):
+    /analysis          risultato completo in un unico documento JSON
+    /analysis/stream   NDJSON a blocchi: avanzamento, riepilogo, poi i brani a lotti
+    /health            stato del servizio e della coda di analisi
+    /metrics           contatori del processo in formato testo Prometheus
+
+`type` è playlist (default), artist o catalog; `id` accetta gli stessi URL, URI, ID e
+nomi dell'app. Le analisi girano nei thread della coda di analysis_jobs, con lo stesso
+client Spotify (connessioni keep-alive e scheduler condivisi): il ciclo asyncio non
+aspetta mai una chiamata a Spotify e le richieste identiche condividono lo stesso job.
+Le credenziali si leggono come in batch_cli. Per provarlo senza rete si puntano
+SPOTIFY_API_BASE_URL e SPOTIFY_TOKEN_URL a benchmarks.fake_spotify.FakeSpotifyAPI;
+`python -m benchmarks.check_api_service` esegue i controlli su entrambe in locale.
+"""
+import argparse
+import asyncio
+import itertools
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+from analysis_cache import AnalysisCache
+from analysis_jobs import AnalysisJobManager
+from artist_cache import ArtistCache
+from batch_cli import DEFAULT_SECRETS_PATH, load_credentials
+from instrumentation import REGISTRY
+from lean_fetch import dumps
+from overlap_index import OverlapIndex
+from popularity_history import PopularityHistory
+from spotify_client import DEFAULT_POOL_SIZE
+
+# --- SERVIZIO HTTP ASYNCIO: ANALISI COME API JSON ---
+
+ANALYSIS_TYPES = {"playlist": "Playlist", "artist": "Artista", "catalog": "Catalogo Artista"}
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_JOB_WORKERS = 16 # Analisi diverse eseguite in parallelo; quelle identiche condividono il job
+STREAM_BATCH_SIZE = 500 # Brani per riga NDJSON nelle risposte in streaming
+KEEP_ALIVE_SECONDS = 15 # Le connessioni client inattive vengono chiuse dopo questo tempo
+MAX_HEADER_BYTES = 16 * 1024
+LISTEN_BACKLOG = 1024 # Connessioni in attesa di accept: i picchi di centinaia di client non vengono rifiutati
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    410: "Gone", 422: "Unprocessable Entity", 431: "Request Header Fields Too Large",
+}
+
+
+def _encode_result(result):
+    """JSON del risultato completo, con i brani compatti dell'archivio espansi in lista."""
+    return dumps(dict(result, all_tracks_data=list(result['all_tracks_data'])))
+
+
+async def iter_job_updates(job):
+    """Aggiornamenti di un AnalysisJob come generatore asincrono: (aggiornamento, finito).
+
+    Il job notifica il ciclo asyncio con call_soon_threadsafe, quindi le richieste in attesa
+    non occupano thread; gli aggiornamenti arrivati fuori ordine vengono scartati.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def listener(version, update, done):
+        loop.call_soon_threadsafe(queue.put_nowait, (version, update, done))
+
+    job.add_listener(listener)
+    last_version = 0
+    try:
+        while True:
+            version, update, done = await queue.get()
+            if version <= last_version:
+                continue
+            last_version = version
+            yield update, done
+            if done:
+                return
+    finally:
+        job.remove_listener(listener)
+
+
+def _parse_request_head(head):
+    """Metodo, target, versione HTTP e intestazioni (nomi in minuscolo) della richiesta."""
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, version = lines[0].split(" ")
+    if not version.startswith("HTTP/1."):
+        raise ValueError(f"Versione HTTP non supportata: {version}")
+    headers = {}
+    for line in filter(None, lines[1:]):
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+
+class AnalysisService:
+    """Server HTTP/1.1 asyncio che espone le analisi tramite un AnalysisJobManager.
+
+    Ogni connessione è una coroutine (keep-alive compreso), quindi centinaia di client
+    in attesa costano solo memoria. `analysis_options` viene passato a ogni analisi
+    (cache, artist_cache, overlap_index, pool_size, ...).
+    """
+
+    def __init__(self, client_id, client_secret, job_manager=None, **analysis_options):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.job_manager = job_manager or AnalysisJobManager(max_workers=DEFAULT_JOB_WORKERS)
+        self.analysis_options = analysis_options
+        self.requests = 0
+        self.open_connections = 0
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Avvia l'ascolto e restituisce l'asyncio.Server (porta 0: scelta dal sistema)."""
+        return await asyncio.start_server(self._handle_connection, host, port, limit=MAX_HEADER_BYTES,
+                                          backlog=LISTEN_BACKLOG)
+
+    async def _handle_connection(self, reader, writer):
+        self.open_connections += 1
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_SECONDS)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._send_json(writer, 431, {"error": "Intestazioni della richiesta troppo grandi."}, False)
+                    return
+                try:
+                    method, target, version, headers = _parse_request_head(head)
+                except ValueError:
+                    await self._send_json(writer, 400, {"error": "Richiesta HTTP non valida."}, False)
+                    return
+                connection = headers.get("connection", "").lower()
+                http_10 = version == "HTTP/1.0"
+                keep_alive = connection == "keep-alive" if http_10 else connection != "close"
+                if method != "GET" or headers.get("content-length", "0") != "0":
+                    await self._send_json(writer, 405, {"error": "Sono supportate solo richieste GET senza corpo."},
+                                          False)
+                    return
+                self.requests += 1
+                # HTTP/1.0 non conosce il chunked: lo stream finisce con la chiusura della connessione
+                if http_10 and urlsplit(target).path == "/analysis/stream":
+                    keep_alive = False
+                await self._dispatch(target, writer, keep_alive, chunked=not http_10)
+        except ConnectionError:
+            pass # Client disconnesso: l'analisi continua per gli altri iscritti al job
+        finally:
+            self.open_connections -= 1
+            writer.close()
+
+    async def _dispatch(self, target, writer, keep_alive, chunked=True):
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        if url.path == "/health":
+            await self._send_json(writer, 200, {
+                "status": "ok",
+                "jobs": self.job_manager.stats(),
+                "requests": self.requests,
+                "open_connections": self.open_connections,
+            }, keep_alive)
+        elif url.path == "/metrics":
+            await self._send(writer, 200, REGISTRY.render_prometheus().encode(),
+                             "text/plain; version=0.0.4; charset=utf-8", keep_alive)
+        elif url.path in ("/analysis", "/analysis/stream"):
+            analysis_type = ANALYSIS_TYPES.get(query.get("type", ["playlist"])[0].lower())
+            identifier = query.get("id", [""])[0].strip()
+            if analysis_type is None or not identifier:
+                await self._send_json(writer, 400, {
+                    "error": f"Parametri richiesti: id e type ({', '.join(ANALYSIS_TYPES)})."
+                }, keep_alive)
+                return
+            job = self.job_manager.submit(analysis_type, identifier, self.client_id, self.client_secret,
+                                          **self.analysis_options)
+            if url.path == "/analysis":
+                await self._send_analysis(job, writer, keep_alive)
+            else:
+                await self._stream_analysis(job, writer, keep_alive, chunked)
+        else:
+            await self._send_json(writer, 404, {"error": f"Percorso sconosciuto: {url.path}"}, keep_alive)
+
+    def _final_result(self, update):
+        """Risultato finale dall'archivio, o None se nel frattempo non è più disponibile."""
+        return self.job_manager.result_store.get(update["result_id"])
+
+    async def _send_analysis(self, job, writer, keep_alive):
+        async for update, done in iter_job_updates(job):
+            if not done:
+                continue
+            if "error" in update:
+                await self._send_json(writer, 422, update, keep_alive)
+                return
+            result = self._final_result(update)
+            if result is None:
+                await self._send_json(writer, 410, {"error": "Risultato non più disponibile: ripeti la richiesta."},
+                                      keep_alive)
+                return
+            # Serializzazione fuori dal ciclo: i risultati grandi non bloccano le altre connessioni
+            body = await asyncio.to_thread(_encode_result, result)
+            await self._send(writer, 200, body, "application/json", keep_alive)
+
+    async def _stream_analysis(self, job, writer, keep_alive, chunked=True):
+        """Risposta NDJSON: una riga "progress" per pagina, poi "result" e i brani a lotti.
+
+        Con `chunked` falso (client HTTP/1.0) il corpo è inviato senza codifica chunked
+        e la fine della risposta è la chiusura della connessione.
+        """
+        framing = "Transfer-Encoding: chunked\r\n" if chunked else ""
+        writer.write(
+            f"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n{framing}"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+        )
+        async for update, done in iter_job_updates(job):
+            if not done:
+                lines = [dict(
+                    {key: value for key, value in update.items() if key not in ("partial", "recent_low_tracks")},
+                    event="progress"
+                )]
+            elif "error" in update:
+                lines = [{"event": "error", "error": update["error"]}]
+            elif (result := self._final_result(update)) is None:
+                lines = [{"event": "error", "error": "Risultato non più disponibile: ripeti la richiesta."}]
+            else:
+                tracks = result["all_tracks_data"]
+                lines = [dict({key: value for key, value in result.items() if key != "all_tracks_data"},
+                              event="result")]
+                # Generatore: i lotti di brani vengono creati uno alla volta durante l'invio
+                lines = itertools.chain(lines, (
+                    {"event": "tracks", "tracks": tracks[start:start + STREAM_BATCH_SIZE]}
+                    for start in range(0, len(tracks), STREAM_BATCH_SIZE)
+                ))
+            for line in lines:
+                chunk = dumps(line) + b"\n"
+                writer.write(b"%x\r\n%b\r\n" % (len(chunk), chunk) if chunked else chunk)
+                await writer.drain() # Rispetta la velocità del client senza accumulare la risposta in memoria
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+
+    async def _send_json(self, writer, status, payload, keep_alive):
+        await self._send(writer, status, dumps(payload), "application/json", keep_alive)
+
+    async def _send(self, writer, status, body, content_type, keep_alive):
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = await service.start(host, port)
+    print(f"Servizio di analisi in ascolto su http://{host}:{port}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servizio HTTP JSON per l'analisi della popolarità Spotify.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Indirizzo di ascolto (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Porta di ascolto (default: {DEFAULT_PORT})")
+    parser.add_argument("--job-workers", type=int, default=DEFAULT_JOB_WORKERS,
+                        help=f"Analisi diverse eseguite in parallelo (default: {DEFAULT_JOB_WORKERS})")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE,
+                        help=f"Connessioni keep-alive verso Spotify (default: {DEFAULT_POOL_SIZE})")
+    parser.add_argument("--cache", dest="cache_path", default=None,
+                        help="Percorso della cache SQLite di analisi playlist e artisti risolti (default: nessuna cache)")
+    parser.add_argument("--overlap-index", dest="index_path", default=None,
+                        help="Percorso dell'indice SQLite di sovrapposizione in cui registrare le playlist analizzate")
+    parser.add_argument("--history", dest="history_path", default=None,
+                        help="Percorso dello storico SQLite in cui registrare gli score dei brani delle playlist")
+    parser.add_argument("--secrets", default=DEFAULT_SECRETS_PATH, help="Percorso di secrets.toml")
+    args = parser.parse_args(argv)
+
+    client_id, client_secret = load_credentials(args.secrets)
+    if not client_id or not client_secret:
+        parser.error("Credenziali Spotify non trovate: imposta SPOTIFY_CLIENT_ID/SPOTIFY_CLIENT_SECRET o secrets.toml.")
+
+    service = AnalysisService(
+        client_id, client_secret, job_manager=AnalysisJobManager(max_workers=args.job_workers),
+        pool_size=args.pool_size,
+        cache=AnalysisCache(args.cache_path) if args.cache_path else None,
+        artist_cache=ArtistCache(args.cache_path) if args.cache_path else None,
+        overlap_index=OverlapIndex(args.index_path) if args.index_path else None,
+        history=PopularityHistory(args.history_path) if args.history_path else None,
+    )
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import json
+import re
+import threading
+import time
+import unicodedata
+
+from analysis_cache import DEFAULT_CACHE_PATH
+from sqlite_storage import connect
+
+# --- CACHE DI RISOLUZIONE ARTISTI (NOME/URL/URI -> ID E METADATI) ---
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60 # Una settimana: nome e immagini cambiano di rado
+DEFAULT_MAX_ENTRIES = 20000
+
+_ARTIST_ID_PATTERN = re.compile(r"^[0-9A-Za-z]{22}$")
+_URL_ID_PATTERN = re.compile(r"(?:[\w-]+\.)?spotify\.com/(?:intl-[a-z-]+/)?artist/([^/?#\s]+)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_artist_name(name):
+    """Chiave di ricerca del nome: Unicode NFKC, minuscolo, spazi singoli."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", name)).strip().casefold()
+
+
+def parse_artist_identifier(identifier):
+    """Classifica l'input senza chiamate API: restituisce ("id", ID), ("name", nome) o ("invalid", valore).
+
+    URL e URI vengono riconosciuti qui; un ID estratto che non è in base62 a 22 caratteri
+    è "invalid" (prima portava a una chiamata fallita seguita da una ricerca).
+    """
+    identifier = identifier.strip()
+    match = _URL_ID_PATTERN.search(identifier)
+    if match:
+        artist_id = match.group(1)
+    elif identifier.startswith("spotify:artist:"):
+        artist_id = identifier.split(":")[-1]
+    else:
+        return "name", normalize_artist_name(identifier)
+    if _ARTIST_ID_PATTERN.match(artist_id):
+        return "id", artist_id
+    return "invalid", artist_id
+
+
+class ArtistCache:
+    """Cache su disco della risoluzione artisti, con scadenza (TTL) e numero massimo di voci.
+
+    Le chiavi sono "id:<ID>" e "name:<nome normalizzato>"; il valore è il dict dell'artista
+    ridotto a `id`, `name` e `images`. Oltre `max_entries` vengono rimosse le voci usate
+    meno di recente (LRU). Per default usa lo stesso file della cache delle analisi.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        with connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS artist_resolution (
+                    lookup_key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_artist_resolution_access ON artist_resolution (last_access)")
+
+    def get(self, kind, value):
+        """Artista salvato per la chiave (`kind` è "id" o "name"), o None se assente o scaduto."""
+        lookup_key = f"{kind}:{value}"
+        now = time.time()
+        with self._lock, connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT payload, created_at FROM artist_resolution WHERE lookup_key = ?", (lookup_key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, created_at = row
+            if now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM artist_resolution WHERE lookup_key = ?", (lookup_key,))
+                return None
+            conn.execute("UPDATE artist_resolution SET last_access = ? WHERE lookup_key = ?", (now, lookup_key))
+        return json.loads(payload)
+
+    def put(self, artist, name_key=None):
+        """Salva l'artista sotto il suo ID e, se indicato, sotto il nome normalizzato cercato."""
+        payload = json.dumps(
+            {"id": artist['id'], "name": artist['name'], "images": artist.get('images') or []},
+            separators=(",", ":")
+        )
+        keys = [f"id:{artist['id']}"] + ([f"name:{name_key}"] if name_key else [])
+        now = time.time()
+        with self._lock, connect(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO artist_resolution VALUES (?, ?, ?, ?)",
+                [(lookup_key, payload, now, now) for lookup_key in keys]
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM artist_resolution WHERE created_at < ?", (now - self.ttl_seconds,))
+        excess = conn.execute("SELECT COUNT(*) FROM artist_resolution").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM artist_resolution WHERE lookup_key IN "
+                "(SELECT lookup_key FROM artist_resolution ORDER BY last_access ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def clear(self):
+        with self._lock, connect(self.path) as conn:
+            conn.execute("DELETE FROM artist_resolution")
@@ -0,0 +1,212 @@
+"""Analisi batch da riga di comando, senza interfaccia Streamlit.
+
+Esempio:
+    python batch_cli.py playlist_notturne.txt -o audit.parquet --workers 8
+    python batch_cli.py roster_etichetta.txt -o catalogo.csv --type "Catalogo Artista"
+    python batch_cli.py playlist_monitorate.txt -o oggi.parquet --history popularity_history.sqlite
+
+Il file di input contiene un identificatore per riga (URL/URI/ID di playlist, URL/URI
+o nome di artista); le righe vuote e quelle che iniziano con `#` vengono ignorate.
+Le credenziali vengono lette da SPOTIFY_CLIENT_ID / SPOTIFY_CLIENT_SECRET oppure
+dalla sezione [spotify] di .streamlit/secrets.toml.
+"""
+import argparse
+import os
+import sys
+import time
+import tomllib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from analysis_cache import AnalysisCache
+from artist_cache import ArtistCache, parse_artist_identifier
+from analysis_model import ScoreSketch
+from analyzer import get_analysis_data
+from overlap_index import OverlapIndex
+from popularity_history import PopularityHistory
+
+DEFAULT_SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+OUTPUT_COLUMNS = [
+    "input_index", "analysis_type", "identifier", "analysis_name", "avg_pop", "median_pop", "p10_pop",
+    "p90_pop", "std_pop", "total_tracks", "total_duplicates", "error", "position", "track_name", "artist", "score", "is_duplicate",
+    "duplicate_rule",
+]
+
+
+def load_credentials(secrets_path):
+    """Restituisce (client_id, client_secret) da variabili d'ambiente o da secrets.toml."""
+    client_id = os.environ.get("SPOTIFY_CLIENT_ID")
+    client_secret = os.environ.get("SPOTIFY_CLIENT_SECRET")
+    if client_id and client_secret:
+        return client_id, client_secret
+    try:
+        with open(secrets_path, "rb") as f:
+            spotify = tomllib.load(f)["spotify"]
+        return spotify["client_id"], spotify["client_secret"]
+    except (OSError, KeyError, tomllib.TOMLDecodeError):
+        return None, None
+
+
+def _detect_analysis_type(identifier, default_type):
+    """Riconosce playlist e artisti da URL/URI; per gli altri input usa `default_type`.
+
+    Gli URL/URI di artista restano nel catalogo completo se è il tipo predefinito.
+    """
+    if "spotify.com/playlist/" in identifier or identifier.startswith("spotify:playlist:"):
+        return "Playlist"
+    if parse_artist_identifier(identifier)[0] != "name": # URL o URI di artista, riconosciuti come nell'analisi
+        return "Catalogo Artista" if default_type == "Catalogo Artista" else "Artista"
+    return default_type
+
+
+def _read_identifiers(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def _analyze_one(input_index, analysis_type, identifier, client_id, client_secret, cache_path, index_path,
+                 history_path):
+    """Esegue un'analisi in un processo worker. Restituisce (righe di output, conteggi dello sketch).
+
+    Gli errori vengono restituiti come una singola riga con la colonna `error` (e sketch
+    None), così un elemento non valido non interrompe il batch.
+    """
+    base = {"input_index": input_index, "analysis_type": analysis_type, "identifier": identifier}
+    try:
+        cache = AnalysisCache(cache_path) if cache_path else None
+        artist_cache = ArtistCache(cache_path) if cache_path else None
+        overlap_index = OverlapIndex(index_path) if index_path else None
+        history = PopularityHistory(history_path) if history_path else None
+        data = get_analysis_data(analysis_type, identifier, client_id, client_secret, cache=cache,
+                                 overlap_index=overlap_index, artist_cache=artist_cache, history=history)
+    except Exception as e:
+        data = {"error": f"{type(e).__name__}: {e}"}
+
+    if "error" in data:
+        return [dict(base, error=data["error"])], None
+
+    distribution = data["distribution"]
+    summary = dict(
+        base,
+        analysis_name=data["name"],
+        avg_pop=data["avg_pop"],
+        median_pop=distribution["median"],
+        p10_pop=distribution["p10"],
+        p90_pop=distribution["p90"],
+        std_pop=distribution["std"],
+        total_tracks=data["total_tracks"],
+        total_duplicates=data["total_duplicates"],
+        error=None,
+    )
+    rows = [
+        dict(summary, position=t["position"], track_name=t["name"], artist=t["artist"],
+             score=t["score"], is_duplicate=t["is_duplicate"], duplicate_rule=t.get("duplicate_rule"))
+        for t in data["all_tracks_data"]
+    ] or [summary]
+    return rows, data["score_sketch"]
+
+
+def _write_output(rows, output_path):
+    frame = pd.DataFrame.from_records(rows, columns=OUTPUT_COLUMNS).sort_values(
+        ["input_index", "position"], kind="stable"
+    )
+    for column in ("avg_pop", "median_pop", "p10_pop", "p90_pop", "total_tracks", "total_duplicates", "position",
+                   "score"):
+        frame[column] = frame[column].astype("Int64")
+    frame["is_duplicate"] = frame["is_duplicate"].astype("boolean")
+
+    if output_path.endswith(".csv"):
+        frame.to_csv(output_path, index=False)
+    else:
+        try:
+            frame.to_parquet(output_path, index=False)
+        except ImportError as e:
+            raise SystemExit(f"Output Parquet non disponibile ({e}). Installa pyarrow oppure usa un file .csv.")
+    return frame
+
+
+def run_batch(identifiers, default_type, client_id, client_secret, output_path, workers=None, cache_path=None,
+              index_path=None, history_path=None):
+    """Analizza tutti gli identificatori con un pool di processi e scrive un unico file colonnare."""
+    rows = []
+    sketch = ScoreSketch()
+    failures = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                _analyze_one, index, _detect_analysis_type(identifier, default_type), identifier,
+                client_id, client_secret, cache_path, index_path, history_path
+            ): (index, identifier)
+            for index, identifier in enumerate(identifiers)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            index, identifier = futures[future]
+            try:
+                item_rows, item_sketch = future.result()
+            except Exception as e:
+                # Es. worker terminato in modo anomalo: l'elemento viene registrato come fallito
+                item_rows, item_sketch = [{"input_index": index, "identifier": identifier,
+                                           "error": f"{type(e).__name__}: {e}"}], None
+            if item_rows[0].get("error"):
+                failures += 1
+                print(f"[{done}/{len(identifiers)}] ERRORE {identifier}: {item_rows[0]['error']}", file=sys.stderr)
+            else:
+                print(f"[{done}/{len(identifiers)}] OK {identifier}", file=sys.stderr)
+            rows.extend(item_rows)
+            if item_sketch is not None:
+                # Gli sketch si sommano: la distribuzione complessiva senza rileggere i brani
+                sketch.merge(ScoreSketch(item_sketch))
+
+    frame = _write_output(rows, output_path)
+    elapsed = time.perf_counter() - started
+    print(
+        f"Completato in {elapsed:.1f}s: {len(identifiers) - failures} analisi riuscite, {failures} fallite, "
+        f"{len(frame)} righe scritte in {output_path}",
+        file=sys.stderr
+    )
+    overall = sketch.summary()
+    if overall["count"]:
+        print(
+            f"Distribuzione complessiva ({overall['count']} brani): media {overall['mean']}, "
+            f"P10 {overall['p10']}, mediana {overall['median']}, P90 {overall['p90']}, std {overall['std']}",
+            file=sys.stderr
+        )
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analisi batch della popolarità Spotify (playlist o artisti).")
+    parser.add_argument("input", help="File con un identificatore di playlist o artista per riga")
+    parser.add_argument("-o", "--output", required=True, help="File di output (.parquet oppure .csv)")
+    parser.add_argument("--type", dest="default_type", choices=("Playlist", "Artista", "Catalogo Artista"),
+                        default="Playlist",
+                        help="Tipo di analisi per gli identificatori non riconoscibili da URL/URI (default: Playlist)")
+    parser.add_argument("--workers", type=int, default=None, help="Numero di processi worker (default: CPU disponibili)")
+    parser.add_argument("--cache", dest="cache_path", default=None,
+                        help="Percorso della cache SQLite di analisi playlist e artisti risolti (default: nessuna cache)")
+    parser.add_argument("--overlap-index", dest="index_path", default=None,
+                        help="Percorso dell'indice SQLite di sovrapposizione in cui registrare le playlist analizzate")
+    parser.add_argument("--history", dest="history_path", default=None,
+                        help="Percorso dello storico SQLite in cui registrare gli score dei brani delle playlist")
+    parser.add_argument("--secrets", default=DEFAULT_SECRETS_PATH, help="Percorso di secrets.toml")
+    args = parser.parse_args(argv)
+
+    client_id, client_secret = load_credentials(args.secrets)
+    if not client_id or not client_secret:
+        parser.error("Credenziali Spotify non trovate: imposta SPOTIFY_CLIENT_ID/SPOTIFY_CLIENT_SECRET o secrets.toml.")
+
+    identifiers = _read_identifiers(args.input)
+    if not identifiers:
+        parser.error(f"Nessun identificatore trovato in {args.input}.")
+
+    failures = run_batch(identifiers, args.default_type, client_id, client_secret, args.output,
+                         workers=args.workers, cache_path=args.cache_path, index_path=args.index_path,
+                         history_path=args.history_path)
+    return 1 if failures == len(identifiers) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""Verifica del servizio HTTP (api_service) contro l'API Spotify finta in locale.
+
+Esecuzione dalla radice del repository:
+    python -m benchmarks.check_api_service
+    python -m benchmarks.check_api_service --clients 400 --playlists 20 --latency 0.02
+
+Avvia FakeSpotifyAPI e AnalysisService su porte scelte dal sistema, poi controlla
+/analysis, /analysis/stream (anche da un client HTTP/1.0), le risposte di errore e la
+deduplicazione: `--clients` richieste concorrenti su `--playlists` playlist devono
+avviare una sola analisi per playlist. Esce con codice 1 se un controllo fallisce.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_spotify import FakeSpotifyAPI
+
+CLIENT_ID = "bench-client"
+CLIENT_SECRET = "bench-secret"
+
+
+def _start_service(service):
+    """Avvia il servizio in un ciclo asyncio su un thread dedicato. Restituisce la porta."""
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    port = []
+
+    def run():
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(service.start("127.0.0.1", 0))
+        port.append(server.sockets[0].getsockname()[1])
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="api-service", daemon=True).start()
+    started.wait()
+    return port[0]
+
+
+def _get(port, path):
+    """GET su una connessione nuova: (status, corpo)."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def _get_http10(port, path):
+    """GET HTTP/1.0 su socket: (intestazioni in minuscolo, corpo letto fino alla chiusura)."""
+    with socket.create_connection(("127.0.0.1", port), timeout=300) as sock:
+        sock.sendall(f"GET {path} HTTP/1.0\r\n\r\n".encode())
+        response = b"".join(iter(lambda: sock.recv(65536), b""))
+    head, _, body = response.partition(b"\r\n\r\n")
+    return head.decode("latin-1").lower(), body
+
+
+def run(size, clients, playlists, latency):
+    fake = FakeSpotifyAPI(latency=latency, duplicate_rate=0.05).start()
+    os.environ["SPOTIFY_API_BASE_URL"] = fake.api_base_url
+    os.environ["SPOTIFY_TOKEN_URL"] = fake.token_url
+    # Import posticipato: gli endpoint vanno impostati prima di creare il client condiviso
+    from api_service import AnalysisService
+
+    service = AnalysisService(CLIENT_ID, CLIENT_SECRET)
+    port = _start_service(service)
+    failures = []
+
+    def check(condition, message):
+        print(f"{'OK    ' if condition else 'ERRORE'} {message}")
+        if not condition:
+            failures.append(message)
+
+    status, body = _get(port, "/health")
+    check(status == 200 and json.loads(body)["status"] == "ok", "/health risponde")
+
+    status, body = _get(port, f"/analysis?type=playlist&id=bench{size}")
+    result = json.loads(body)
+    check(status == 200, f"/analysis bench{size}: status {status}")
+    check(result.get("total_tracks") == size and len(result.get("all_tracks_data", [])) == size,
+          f"/analysis bench{size}: {result.get('total_tracks')} brani, {len(result.get('all_tracks_data', []))} righe")
+
+    status, body = _get(port, f"/analysis/stream?type=playlist&id=bench{size + 1}")
+    lines = [json.loads(line) for line in body.splitlines()]
+    events = [line["event"] for line in lines]
+    streamed = sum(len(line["tracks"]) for line in lines if line["event"] == "tracks")
+    check(status == 200 and "progress" in events and events.count("result") == 1,
+          f"/analysis/stream: {events.count('progress')} righe progress, {events.count('result')} result")
+    check(streamed == size + 1, f"/analysis/stream: {streamed} brani trasmessi a lotti")
+
+    # Un client HTTP/1.0 non decodifica il chunked: corpo NDJSON semplice, chiuso dal server
+    head, body = _get_http10(port, f"/analysis/stream?type=playlist&id=bench{size + 2}")
+    lines = [json.loads(line) for line in body.splitlines()]
+    streamed = sum(len(line["tracks"]) for line in lines if line["event"] == "tracks")
+    check(" 200 " in head.split("\r\n")[0] and "transfer-encoding" not in head and "connection: close" in head
+          and streamed == size + 2, f"/analysis/stream HTTP/1.0: {streamed} brani senza chunked")
+
+    status, _ = _get(port, "/analysis?type=playlist&id=bad")
+    check(status == 422, f"playlist inesistente: status {status}")
+    status, _ = _get(port, "/analysis?type=unknown&id=bench10")
+    check(status == 400, f"tipo non valido: status {status}")
+
+    # Deduplicazione: molte richieste concorrenti, una sola analisi per playlist
+    before = service.job_manager.stats()
+    paths = [
+        f"/analysis{'/stream' if index % 3 == 0 else ''}?id=bench{2 * size + index % playlists}"
+        for index in range(clients)
+    ]
+    fake.reset_counters()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        statuses = [status for status, _ in executor.map(lambda path: _get(port, path), paths)]
+    elapsed = time.perf_counter() - started
+    after = service.job_manager.stats()
+    submitted = after["submitted"] - before["submitted"]
+    deduplicated = after["deduplicated"] - before["deduplicated"]
+    check(all(status == 200 for status in statuses),
+          f"{clients} client concorrenti in {elapsed:.1f}s: status {sorted(set(statuses))}")
+    check(submitted == playlists and deduplicated == clients - playlists,
+          f"deduplicazione: {submitted} analisi avviate, {deduplicated} richieste unite "
+          f"({fake.requests} richieste all'API finta)")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifica del servizio HTTP contro l'API Spotify finta.")
+    parser.add_argument("--size", type=int, default=1200, help="Brani delle playlist analizzate")
+    parser.add_argument("--clients", type=int, default=200, help="Richieste concorrenti nel controllo di deduplicazione")
+    parser.add_argument("--playlists", type=int, default=10, help="Playlist diverse tra le richieste concorrenti")
+    parser.add_argument("--latency", type=float, default=0.01, help="Latenza simulata per richiesta, in secondi")
+    args = parser.parse_args(argv)
+
+    failures = run(args.size, args.clients, args.playlists, args.latency)
+    print(f"{len(failures)} controlli falliti" if failures else "Tutti i controlli superati")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
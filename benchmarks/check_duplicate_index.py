@@ -0,0 +1,64 @@
+"""Verifica della chiave titolo/artista normalizzata (duplicate_index), senza rete.
+
+Esecuzione dalla radice del repository:
+    python -m benchmarks.check_duplicate_index
+
+Controlla che la normalizzazione tolga accenti e suffissi di edizione ma conservi le
+lettere di ogni alfabeto: titoli non latini o misti che differiscono solo nella parte
+non ASCII devono restare brani distinti. Esce con codice 1 se un controllo fallisce.
+"""
+import sys
+
+from duplicate_index import normalize_title_artist
+
+# (titolo A, artista A, titolo B, artista B): stessa chiave attesa
+SAME_KEY = [
+    ("Déjà Vu", "Beyoncé", "deja vu", "BEYONCE"),
+    ("Yesterday - Remastered 2009", "The Beatles", "Yesterday", "The Beatles"),
+    ("Song (feat. Bob) [Radio Edit]", "Alice", "Song", "Alice"),
+    ("Ёлка", "Кино", "ЕЛКА", "кино"),
+    ("Straße", "Die Ärzte", "STRASSE", "Die Arzte"),
+    ("ＬＯＶＥ", "Aimer", "love", "Aimer"),
+]
+# Chiavi attese diverse: brani distinti che la normalizzazione non deve unire
+DIFFERENT_KEY = [
+    ("Love 愛", "Aimer", "Love 恋", "Aimer"),
+    ("카페", "IU", "카폐", "IU"),
+    ("カゲ", "Aimer", "カケ", "Aimer"),
+    ("किस्मत", "Arijit Singh", "कसमत", "Arijit Singh"),
+    ("Кино", "Группа", "Кина", "Группа"),
+    ("Hello (Clean Bandit Remix)", "Adele", "Hello", "Adele"),
+    ("Take Me (With U)", "Prince", "Take Me", "Prince"),
+]
+# Titoli e artisti interamente non latini devono avere una chiave
+NON_LATIN = [("Группа крови", "Кино"), ("夜に駆ける", "YOASOBI"), ("사랑", "아이유"), ("أحبك", "عمرو دياب")]
+
+
+def run():
+    failures = []
+
+    def check(condition, message):
+        print(f"{'OK    ' if condition else 'ERRORE'} {message}")
+        if not condition:
+            failures.append(message)
+
+    for title_a, artist_a, title_b, artist_b in SAME_KEY:
+        key_a, key_b = normalize_title_artist(title_a, artist_a), normalize_title_artist(title_b, artist_b)
+        check(key_a is not None and key_a == key_b, f"{title_a!r} = {title_b!r}: {key_a!r} / {key_b!r}")
+    for title_a, artist_a, title_b, artist_b in DIFFERENT_KEY:
+        key_a, key_b = normalize_title_artist(title_a, artist_a), normalize_title_artist(title_b, artist_b)
+        check(key_a != key_b, f"{title_a!r} != {title_b!r}: {key_a!r} / {key_b!r}")
+    for title, artist in NON_LATIN:
+        key = normalize_title_artist(title, artist)
+        check(key is not None, f"{title!r} / {artist!r}: {key!r}")
+    return failures
+
+
+def main():
+    failures = run()
+    print(f"{len(failures)} controlli falliti" if failures else "Tutti i controlli superati")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
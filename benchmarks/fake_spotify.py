@@ -0,0 +1,326 @@
+"""API Spotify finta in locale per benchmark e prove senza rete né credenziali.
+
+Espone gli endpoint usati dall'app (token, playlist, elementi della playlist con
+paginazione, artista, ricerca, top tracks, album dell'artista, album multipli e brani
+dell'album, brano singolo e multiplo) con dati sintetici
+deterministici. La dimensione della playlist è codificata nell'ID: `bench5000` ha 5000
+brani; il catalogo di un artista trovato per nome ha tante uscite quante indicate dalle
+cifre finali del nome (`Synthetic Artist 300`: 300 uscite, altrimenti 30), con singoli che
+ripubblicano brani degli album con un nuovo ID e lo stesso ISRC. Latenza per richiesta
+e percentuale di duplicati sono configurabili. Il parametro
+`fields` degli elementi della playlist viene applicato come nell'API reale, così i byte
+trasferiti riflettono la proiezione richiesta.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PLAYLIST_ID_PATTERN = re.compile(r"^bench(\d+)$")
+MAX_PAGE_SIZE = 100
+MAX_TRACKS_PER_REQUEST = 50
+TOP_TRACKS_COUNT = 10
+MAX_ALBUMS_PER_REQUEST = 20
+MAX_ARTIST_ALBUMS_PAGE = 50
+DEFAULT_CATALOG_RELEASES = 30
+CATALOG_TRACK_BASE = 1_000_000_000 # Brani degli album: base + uscita * 100 + traccia
+REISSUE_OFFSET = 5_000_000_000 # Ripubblicazioni: stesso titolo e ISRC del brano (numero - offset)
+ALBUM_ID_PATTERN = re.compile(r"^alb(\d{6})(\w+)$")
+
+
+def parse_fields(fields):
+    """Albero dei campi richiesti da una stringa `fields` (es. "items(track(id,name)),total").
+
+    Ogni nodo è un dict nome -> sottoalbero; None indica l'oggetto completo. I percorsi
+    puntati ("items.track.id") equivalgono alla forma con parentesi.
+    """
+    tree = {}
+    depth, start = 0, 0
+    parts = []
+    for index, char in enumerate(fields):
+        depth += (char == "(") - (char == ")")
+        if char == "," and depth == 0:
+            parts.append(fields[start:index])
+            start = index + 1
+    parts.append(fields[start:])
+
+    for part in filter(None, parts):
+        dot, paren = part.find("."), part.find("(")
+        if dot != -1 and (paren == -1 or dot < paren):
+            name, subtree = part[:dot], parse_fields(part[dot + 1:])
+        elif paren != -1:
+            name, subtree = part[:paren], parse_fields(part[paren + 1:-1])
+        else:
+            name, subtree = part, None
+        _merge_field(tree, name, subtree)
+    return tree
+
+
+def _merge_field(tree, name, subtree):
+    if name not in tree:
+        tree[name] = subtree
+    elif tree[name] is None or subtree is None:
+        tree[name] = None
+    else:
+        for child, child_subtree in subtree.items():
+            _merge_field(tree[name], child, child_subtree)
+
+
+def project(value, tree):
+    """Applica l'albero dei campi: le liste vengono filtrate elemento per elemento."""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [project(element, tree) for element in value]
+    if isinstance(value, dict):
+        return {name: project(value[name], subtree) for name, subtree in tree.items() if name in value}
+    return value
+
+
+def _synthetic_track(track_number):
+    if track_number >= REISSUE_OFFSET:
+        track = _synthetic_track(track_number - REISSUE_OFFSET)
+        track["id"] = f"t{track_number:010d}"
+        track["popularity"] = random.Random(track_number).randint(0, 100)
+        return track
+    rng = random.Random(track_number)
+    artist_number = track_number % 997
+    return {
+        "id": f"t{track_number:010d}",
+        "name": f"Synthetic Track {track_number}",
+        "artists": [{
+            "id": f"a{artist_number:010d}",
+            "name": f"Synthetic Artist {artist_number}",
+            "type": "artist",
+            "uri": f"spotify:artist:a{artist_number:010d}",
+            "external_urls": {"spotify": f"https://open.spotify.com/artist/a{artist_number:010d}"},
+        }],
+        "popularity": rng.randint(0, 100),
+        "external_ids": {"isrc": f"QZBEN{track_number:07d}"},
+    }
+
+
+class FakeSpotifyAPI:
+    """Server HTTP locale con contatori di richieste e byte inviati."""
+
+    def __init__(self, latency=0.0, duplicate_rate=0.05, seed=42, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.duplicate_rate = duplicate_rate
+        self.seed = seed
+        self.requests = 0
+        self.bytes_sent = 0
+        self._counter_lock = threading.Lock()
+        self._playlists = {}
+        self._playlists_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_base_url(self):
+        return f"{self.base_url}/v1/"
+
+    @property
+    def token_url(self):
+        return f"{self.base_url}/api/token"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_counters(self):
+        with self._counter_lock:
+            self.requests = 0
+            self.bytes_sent = 0
+
+    def playlist_track_numbers(self, playlist_id):
+        """Numeri dei brani della playlist, con una quota `duplicate_rate` di ripetizioni."""
+        with self._playlists_lock:
+            numbers = self._playlists.get(playlist_id)
+            if numbers is None:
+                size = int(PLAYLIST_ID_PATTERN.match(playlist_id).group(1))
+                rng = random.Random(f"{self.seed}-{playlist_id}")
+                numbers = []
+                for index in range(size):
+                    if numbers and rng.random() < self.duplicate_rate:
+                        numbers.append(rng.choice(numbers))
+                    else:
+                        numbers.append(index)
+                self._playlists[playlist_id] = numbers
+            return numbers
+
+    # --- RISPOSTE DEGLI ENDPOINT ---
+
+    def _playlist(self, playlist_id, query):
+        numbers = self.playlist_track_numbers(playlist_id)
+        return {
+            "id": playlist_id,
+            "name": f"Benchmark playlist ({len(numbers)} brani)",
+            "images": [],
+            "snapshot_id": f"snap-{playlist_id}-{self.duplicate_rate}",
+            "tracks": {"total": len(numbers)},
+        }
+
+    def _playlist_items(self, playlist_id, query):
+        numbers = self.playlist_track_numbers(playlist_id)
+        limit = min(int(query.get("limit", ["100"])[0]), MAX_PAGE_SIZE)
+        offset = int(query.get("offset", ["0"])[0])
+        page = numbers[offset:offset + limit]
+        next_url = None
+        if offset + limit < len(numbers):
+            next_url = f"{self.api_base_url}playlists/{playlist_id}/items?offset={offset + limit}&limit={limit}"
+        body = {
+            "items": [{"track": _synthetic_track(number)} for number in page],
+            "limit": limit,
+            "offset": offset,
+            "total": len(numbers),
+            "next": next_url,
+        }
+        fields = query.get("fields", [""])[0]
+        return project(body, parse_fields(fields)) if fields else body
+
+    def _artist(self, artist_id):
+        return {"id": artist_id, "name": f"Synthetic Artist {artist_id}", "images": []}
+
+    def _search(self, query):
+        name = query.get("q", [""])[0].replace("artist:", "")
+        releases = re.search(r"(\d+)$", name)
+        artist_id = f"benchartist{releases.group(1)}" if releases else "benchartist"
+        return {"artists": {"items": [{"id": artist_id, "name": name, "images": []}]}}
+
+    # --- CATALOGO ARTISTA: USCITE, ALBUM E BRANI DEGLI ALBUM ---
+
+    @staticmethod
+    def _release_track_numbers(release):
+        """Brani di un'uscita: album da 12 (il primo da 60, per la paginazione), singoli ogni 3 uscite."""
+        if release % 3 == 2:
+            # Singolo che ripubblica la prima traccia dell'album precedente
+            return [REISSUE_OFFSET + CATALOG_TRACK_BASE + (release - 1) * 100]
+        return [CATALOG_TRACK_BASE + release * 100 + index for index in range(60 if release == 0 else 12)]
+
+    def _artist_albums(self, artist_id, query):
+        releases = re.search(r"(\d+)$", artist_id)
+        total = int(releases.group(1)) if releases else DEFAULT_CATALOG_RELEASES
+        limit = min(int(query.get("limit", ["20"])[0]), MAX_ARTIST_ALBUMS_PAGE)
+        offset = int(query.get("offset", ["0"])[0])
+        items = [
+            {"id": f"alb{release:06d}{artist_id}", "name": f"Release {release}",
+             "album_type": "single" if release % 3 == 2 else "album"}
+            for release in range(offset, min(offset + limit, total))
+        ]
+        return {"items": items, "limit": limit, "offset": offset, "total": total,
+                "next": None if offset + limit >= total else "more"}
+
+    def _album_tracks(self, album_id, query):
+        release, artist_id = ALBUM_ID_PATTERN.match(album_id).groups()
+        numbers = self._release_track_numbers(int(release))
+        limit = min(int(query.get("limit", ["20"])[0]), MAX_TRACKS_PER_REQUEST)
+        offset = int(query.get("offset", ["0"])[0])
+        items = [
+            {"id": f"t{number:010d}", "name": _synthetic_track(number)["name"],
+             "artists": [{"id": artist_id, "name": f"Synthetic Artist {artist_id}"}]}
+            for number in numbers[offset:offset + limit]
+        ]
+        next_url = None
+        if offset + limit < len(numbers):
+            next_url = f"{self.api_base_url}albums/{album_id}/tracks?offset={offset + limit}&limit={limit}"
+        return {"items": items, "limit": limit, "offset": offset, "total": len(numbers), "next": next_url}
+
+    def _albums(self, query):
+        ids = [album_id for album_id in query.get("ids", [""])[0].split(",") if album_id][:MAX_ALBUMS_PER_REQUEST]
+        albums = []
+        for album_id in ids:
+            albums.append({"id": album_id, "name": f"Release {album_id}", "images": [],
+                           "tracks": self._album_tracks(album_id, {"limit": [str(MAX_TRACKS_PER_REQUEST)]})})
+        return {"albums": albums}
+
+    def _top_tracks(self, artist_id):
+        return {"tracks": [_synthetic_track(number) for number in range(TOP_TRACKS_COUNT)]}
+
+    def _tracks(self, query):
+        ids = query.get("ids", [""])[0].split(",")[:MAX_TRACKS_PER_REQUEST]
+        return {"tracks": [_synthetic_track(int(track_id[1:])) for track_id in ids if track_id]}
+
+    def route(self, method, path, query):
+        """Restituisce (status, corpo JSON) per la richiesta."""
+        if method == "POST" and path == "/api/token":
+            return 200, {"access_token": "fake-token", "token_type": "Bearer", "expires_in": 3600}
+        parts = [part for part in path.split("/") if part]
+        if method != "GET" or not parts or parts[0] != "v1":
+            return 404, {"error": {"status": 404, "message": "Not found"}}
+        parts = parts[1:]
+        try:
+            if parts[0] == "playlists" and len(parts) == 2:
+                return 200, self._playlist(parts[1], query)
+            if parts[0] == "playlists" and len(parts) == 3 and parts[2] in ("items", "tracks"):
+                return 200, self._playlist_items(parts[1], query)
+            if parts[0] == "artists" and len(parts) == 2:
+                return 200, self._artist(parts[1])
+            if parts[0] == "artists" and len(parts) == 3 and parts[2] == "top-tracks":
+                return 200, self._top_tracks(parts[1])
+            if parts[0] == "artists" and len(parts) == 3 and parts[2] == "albums":
+                return 200, self._artist_albums(parts[1], query)
+            if parts[0] == "albums" and len(parts) == 1:
+                return 200, self._albums(query)
+            if parts[0] == "albums" and len(parts) == 3 and parts[2] == "tracks":
+                return 200, self._album_tracks(parts[1], query)
+            if parts[0] == "search":
+                return 200, self._search(query)
+            if parts[0] == "tracks" and len(parts) == 1:
+                return 200, self._tracks(query)
+            if parts[0] == "tracks" and len(parts) == 2:
+                return 200, _synthetic_track(int(parts[1][1:]))
+        except (AttributeError, ValueError):
+            return 404, {"error": {"status": 404, "message": "Invalid id"}}
+        return 404, {"error": {"status": 404, "message": "Not found"}}
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive, come l'API reale
+
+            def _respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                if api.latency:
+                    time.sleep(api.latency)
+                url = urlparse(self.path)
+                status, body = api.route(self.command, url.path, parse_qs(url.query))
+                payload = json.dumps(body).encode()
+                with api._counter_lock:
+                    api.requests += 1
+                    api.bytes_sent += len(payload)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = _respond
+            do_POST = _respond
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,168 @@
+"""Benchmark offline di recupero, aggregazione e generazione HTML.
+
+Esecuzione dalla radice del repository:
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --sizes 50 1000 10000 --latency 0.05 --json bench.json
+
+Ogni fase viene eseguita due volte: la prima misura il tempo, la seconda il picco di
+memoria con tracemalloc (che rallenta l'esecuzione e falserebbe i tempi).
+
+Le fasi `*_legacy` usano il formato precedente (oggetti artista completi, decodifica
+spotipy con json); le altre la proiezione minima dei campi di lean_fetch. Le fasi
+`decode_*` misurano solo la decodifica delle pagine e la creazione dei record compatti.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from benchmarks.fake_spotify import FakeSpotifyAPI
+
+DEFAULT_SIZES = [50, 500, 2000, 10000]
+CLIENT_ID = "bench-client"
+CLIENT_SECRET = "bench-secret"
+PAGE_SIZE = 100 # Come PLAYLIST_PAGE_SIZE di analyzer (massimo consentito dall'API)
+
+
+def _measure(function, fake):
+    """Esegue `function` due volte: tempo e chiamate API, poi picco di memoria."""
+    fake.reset_counters()
+    started = time.perf_counter()
+    result = function()
+    wall = time.perf_counter() - started
+    api_calls = fake.requests
+    bytes_received = fake.bytes_sent
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {
+        "wall_s": round(wall, 4),
+        "api_calls": api_calls,
+        "bytes_received": bytes_received,
+        "peak_mem_kb": round(peak / 1024, 1),
+    }
+
+
+def _measure_decode(fake, playlist_id, fields, decode, page_rows):
+    """Tempo di decodifica delle pagine già serializzate, senza rete: byte e secondi."""
+    payloads = []
+    for offset in range(0, len(fake.playlist_track_numbers(playlist_id)), PAGE_SIZE):
+        _, body = fake.route("GET", f"/v1/playlists/{playlist_id}/items",
+                             {"fields": [fields], "offset": [str(offset)], "limit": [str(PAGE_SIZE)]})
+        payloads.append((offset, json.dumps(body).encode()))
+
+    def decode_pages():
+        return [page_rows(decode(payload)['items'], offset) for offset, payload in payloads]
+
+    started = time.perf_counter()
+    decode_pages()
+    wall = time.perf_counter() - started
+    tracemalloc.start()
+    decode_pages()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "wall_s": round(wall, 4),
+        "api_calls": 0,
+        "bytes_received": sum(len(payload) for _, payload in payloads),
+        "peak_mem_kb": round(peak / 1024, 1),
+    }
+
+
+def run(sizes, latency, duplicate_rate, rate_per_second=None):
+    # Import posticipati: gli endpoint vanno impostati prima di creare il client condiviso
+    from analysis_model import RunningTrackStats, compute_metrics, frame_to_records
+    from analyzer import _iter_playlist_pages, get_analysis_data
+    from lean_fetch import LEAN_PLAYLIST_ITEMS_FIELDS, LEGACY_PLAYLIST_ITEMS_FIELDS, loads, page_rows
+    from request_scheduler import get_scheduler
+    from spotify_client import get_spotify_client
+    from track_list_html import build_track_rows_html
+
+    if rate_per_second:
+        scheduler = get_scheduler()
+        scheduler.rate_per_second = rate_per_second
+        scheduler.burst = max(scheduler.burst, int(rate_per_second))
+
+    results = []
+    with FakeSpotifyAPI(latency=latency, duplicate_rate=duplicate_rate) as fake:
+        os.environ["SPOTIFY_API_BASE_URL"] = fake.api_base_url
+        os.environ["SPOTIFY_TOKEN_URL"] = fake.token_url
+        sp = get_spotify_client(CLIENT_ID, CLIENT_SECRET)
+        sp.playlist("bench1") # Scalda token e connessioni
+
+        for size in sizes:
+            playlist_id = f"bench{size}"
+
+            def fetch_pages():
+                return [rows for _, _, rows in _iter_playlist_pages(sp, playlist_id)]
+
+            pages, fetch_stats = _measure(fetch_pages, fake)
+            _, legacy_fetch_stats = _measure(
+                lambda: [rows for _, _, rows in _iter_playlist_pages(sp, playlist_id, lean=False)], fake
+            )
+
+            def aggregate():
+                stats = RunningTrackStats()
+                for rows in pages:
+                    stats.add_rows(rows)
+                frame = stats.to_frame()
+                compute_metrics(frame)
+                return frame_to_records(frame)
+
+            records, aggregate_stats = _measure(aggregate, fake)
+            _, html_stats = _measure(lambda: build_track_rows_html(records), fake)
+
+            for parallel in (True, False):
+                _, end_to_end = _measure(
+                    lambda: get_analysis_data("Playlist", playlist_id, CLIENT_ID, CLIENT_SECRET, parallel_pages=parallel),
+                    fake
+                )
+                results.append(dict(stage=f"end_to_end_{'parallel' if parallel else 'sequential'}", tracks=size, **end_to_end))
+            results.append(dict(stage="fetch_pages", tracks=size, **fetch_stats))
+            results.append(dict(stage="fetch_pages_legacy", tracks=size, **legacy_fetch_stats))
+            for stage, fields, decode in (("decode", LEAN_PLAYLIST_ITEMS_FIELDS, loads),
+                                          ("decode_legacy", LEGACY_PLAYLIST_ITEMS_FIELDS, json.loads)):
+                results.append(dict(stage=stage, tracks=size, **_measure_decode(fake, playlist_id, fields, decode, page_rows)))
+            results.append(dict(stage="aggregate", tracks=size, **aggregate_stats))
+            results.append(dict(stage="html_rows", tracks=size, **html_stats))
+
+        _, artist_stats = _measure(
+            lambda: get_analysis_data("Artista", "Synthetic Artist", CLIENT_ID, CLIENT_SECRET), fake
+        )
+        results.append(dict(stage="end_to_end_artist", tracks=10, **artist_stats))
+    return results
+
+
+def _print_table(results):
+    header = f"{'stage':<26}{'tracks':>8}{'wall_s':>10}{'api_calls':>11}{'bytes':>12}{'peak_mem_kb':>13}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(f"{row['stage']:<26}{row['tracks']:>8}{row['wall_s']:>10.4f}{row['api_calls']:>11}"
+              f"{row['bytes_received']:>12}{row['peak_mem_kb']:>13.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline con API Spotify finta in locale.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Dimensioni delle playlist sintetiche")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latenza simulata per richiesta, in secondi")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="Quota di brani duplicati (0-1)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Richieste al secondo dello scheduler (default: valore di produzione)")
+    parser.add_argument("--json", dest="json_path", default=None, help="Salva i risultati anche in formato JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.latency, args.duplicate_rate, args.rate)
+    _print_table(results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import re
+import unicodedata
+
+# --- INDICE DEI DUPLICATI TRA ID DIVERSI (ID, ISRC, TITOLO + ARTISTA NORMALIZZATI) ---
+
+# Regole in ordine di precedenza: la prima che trova un brano precedente vince
+RULE_TRACK_ID = "id"
+RULE_ISRC = "isrc"
+RULE_TITLE_ARTIST = "title_artist"
+DUPLICATE_RULES = (RULE_TRACK_ID, RULE_ISRC, RULE_TITLE_ARTIST)
+
+# Suffissi di edizione che non cambiano la registrazione. Versioni live, remix e
+# acustiche restano distinte: hanno un ISRC diverso e sono brani diversi per i curatori.
+# Si rimuove solo un gruppo tra parentesi intero o un "- ..." finale, a fine titolo.
+_EDITION_KEYWORDS = (
+    r"(?:\d{4}\s+)?remaster(?:ed)?\b(?:\s+\d{4})?(?:\s+version\b)?|single version\b|album version\b"
+    r"|original mix\b|explicit\b(?: version\b)?|clean\b(?: version\b)?|radio edit\b"
+    r"|(?:feat|ft|featuring)\b\.?\s+[^()\[\]]+"
+)
+_EDITION_PATTERN = re.compile(
+    rf"(?:\s*[(\[]\s*(?:{_EDITION_KEYWORDS})\s*[)\]]|\s+[-–]\s+(?:{_EDITION_KEYWORDS}))\s*$",
+    re.IGNORECASE
+)
+# Solo i diacritici (accenti, dieresi, cediglie): vocali e virama indiani o dakuten giapponesi
+# sono anch'essi segni combinanti ma distinguono parole diverse e restano nella chiave
+_DIACRITICS = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]+")
+
+
+def _fold(text):
+    """Casefold senza accenti, con solo lettere, cifre e segni (di ogni alfabeto) separati da spazi singoli."""
+    text = unicodedata.normalize("NFC", _DIACRITICS.sub("", unicodedata.normalize("NFKD", text))).casefold()
+    return " ".join("".join(
+        char if char.isalnum() or unicodedata.category(char).startswith("M") else " " for char in text
+    ).split())
+
+
+def normalize_title_artist(title, primary_artist):
+    """Chiave titolo/artista principale che ignora maiuscole, accenti, punteggiatura e suffissi di edizione."""
+    if not title or not primary_artist:
+        return None
+    # I suffissi si tolgono uno alla volta dalla fine (es. "(feat. X) - Remastered 2011")
+    stripped = _EDITION_PATTERN.sub("", title)
+    while stripped != title:
+        title, stripped = stripped, _EDITION_PATTERN.sub("", stripped)
+    folded_title = _fold(title)
+    folded_artist = _fold(primary_artist)
+    if not folded_title or not folded_artist:
+        return None
+    return f"{folded_title}\x1f{folded_artist}"
+
+
+def normalize_isrc(isrc):
+    if not isrc:
+        return None
+    return isrc.replace("-", "").strip().upper() or None
+
+
+class DuplicateIndex:
+    """Indice hash dei brani già visti: ogni controllo costa O(1), senza confronti a coppie."""
+
+    def __init__(self):
+        self._seen = {rule: set() for rule in DUPLICATE_RULES}
+
+    def check_and_add(self, track_id, isrc, title_key):
+        """Registra il brano e restituisce la regola che lo rende duplicato, o None."""
+        matched = None
+        for rule, key in ((RULE_TRACK_ID, track_id), (RULE_ISRC, isrc), (RULE_TITLE_ARTIST, title_key)):
+            if key is None:
+                continue
+            seen = self._seen[rule]
+            if matched is None and key in seen:
+                matched = rule
+            seen.add(key)
+        return matched
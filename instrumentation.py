@@ -0,0 +1,196 @@
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+# --- STRUMENTAZIONE: TEMPI PER FASE E CONTATORI HTTP ---
+
+logger = logging.getLogger("playlist_analyzer.metrics")
+
+# Fasi misurate, nell'ordine in cui vengono mostrate
+STAGES = ("auth", "metadata", "pagination", "track_lookup", "aggregation", "cache", "indexing", "render")
+
+_current_metrics = contextvars.ContextVar("analysis_metrics", default=None)
+
+
+class AnalysisMetrics:
+    """Tempi per fase e contatori HTTP di una singola analisi. Thread-safe."""
+
+    def __init__(self):
+        self.stages = {}
+        self.http_requests = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.throttled = 0
+        self.parse_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Misura il blocco come tempo della fase `name` e vi attribuisce le richieste HTTP."""
+        started = time.perf_counter()
+        with self.bind():
+            try:
+                yield self
+            finally:
+                self.add_time(name, time.perf_counter() - started)
+
+    @contextlib.contextmanager
+    def bind(self):
+        """Attribuisce a questa analisi le richieste HTTP fatte dal thread corrente nel blocco."""
+        token = _current_metrics.set(self)
+        try:
+            yield self
+        finally:
+            _current_metrics.reset(token)
+
+    def record_response(self, response_bytes):
+        with self._lock:
+            self.http_requests += 1
+            self.bytes_received += response_bytes
+
+    def record_retry(self, throttled=False):
+        with self._lock:
+            self.retries += 1
+            self.throttled += throttled
+
+    def record_parse(self, seconds):
+        """Tempo di decodifica JSON delle risposte (incluso nella fase in cui avviene)."""
+        with self._lock:
+            self.parse_seconds += seconds
+        REGISTRY.record_parse(seconds)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "stages": {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+                "http_requests": self.http_requests,
+                "bytes_received": self.bytes_received,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "parse_seconds": round(self.parse_seconds, 4),
+            }
+
+
+def current_metrics():
+    """Metriche dell'analisi associata al thread corrente, se presente."""
+    return _current_metrics.get()
+
+
+def record_http_response(response):
+    """Chiamata dal livello HTTP per ogni risposta ricevuta."""
+    response_bytes = len(response.content or b"")
+    REGISTRY.record_http(response_bytes)
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.record_response(response_bytes)
+
+
+def record_http_retry(throttled=False):
+    REGISTRY.record_retry(throttled)
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.record_retry(throttled)
+
+
+class MetricsRegistry:
+    """Contatori cumulativi del processo, esportabili in formato testo Prometheus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.analyses = {}
+        self.stage_seconds = {}
+        self.stage_count = {}
+        self.http_requests = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.throttled = 0
+        self.parse_seconds = 0.0
+
+    def record_http(self, response_bytes):
+        with self._lock:
+            self.http_requests += 1
+            self.bytes_received += response_bytes
+
+    def record_retry(self, throttled=False):
+        with self._lock:
+            self.retries += 1
+            self.throttled += throttled
+
+    def record_parse(self, seconds):
+        with self._lock:
+            self.parse_seconds += seconds
+
+    def record_stage(self, stage, seconds):
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            self.stage_count[stage] = self.stage_count.get(stage, 0) + 1
+
+    def record_analysis(self, analysis_type, outcome, metrics):
+        with self._lock:
+            key = (analysis_type, outcome)
+            self.analyses[key] = self.analyses.get(key, 0) + 1
+        for stage, seconds in metrics.stages.items():
+            self.record_stage(stage, seconds)
+
+    def render_prometheus(self):
+        """Esposizione in formato testo Prometheus (text/plain; version=0.0.4)."""
+        with self._lock:
+            lines = [
+                "# HELP analyzer_analyses_total Analisi completate per tipo ed esito.",
+                "# TYPE analyzer_analyses_total counter",
+            ]
+            for (analysis_type, outcome), count in sorted(self.analyses.items()):
+                lines.append(f'analyzer_analyses_total{{type="{analysis_type}",outcome="{outcome}"}} {count}')
+            lines += [
+                "# HELP analyzer_stage_seconds Tempo speso per fase dell'analisi.",
+                "# TYPE analyzer_stage_seconds summary",
+            ]
+            for stage in sorted(self.stage_seconds):
+                lines.append(f'analyzer_stage_seconds_sum{{stage="{stage}"}} {self.stage_seconds[stage]:.6f}')
+                lines.append(f'analyzer_stage_seconds_count{{stage="{stage}"}} {self.stage_count[stage]}')
+            for name, help_text, value in (
+                ("analyzer_http_requests_total", "Richieste HTTP verso Spotify.", self.http_requests),
+                ("analyzer_http_bytes_received_total", "Byte ricevuti da Spotify.", self.bytes_received),
+                ("analyzer_http_retries_total", "Richieste ripetute dopo un errore 5xx (urllib3) o un 429.", self.retries),
+                ("analyzer_http_throttled_total", "Risposte 429 ricevute.", self.throttled),
+                ("analyzer_json_parse_seconds_total", "Tempo di decodifica JSON delle risposte.",
+                 round(self.parse_seconds, 6)),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_file(self, path):
+        """Scrive l'esposizione in modo atomico (es. per il textfile collector di node_exporter)."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def log_analysis(analysis_type, identifier, metrics, outcome="ok", **extra):
+    """Registra l'analisi: log JSON strutturato e, se ANALYZER_METRICS_FILE è impostato, file Prometheus."""
+    REGISTRY.record_analysis(analysis_type, outcome, metrics)
+    record = {"event": "analysis", "analysis_type": analysis_type, "identifier": identifier, "outcome": outcome}
+    record.update(metrics.as_dict())
+    record.update(extra)
+    logger.info(json.dumps(record, ensure_ascii=False))
+
+    metrics_file = os.environ.get("ANALYZER_METRICS_FILE")
+    if metrics_file:
+        try:
+            REGISTRY.write_prometheus_file(metrics_file)
+        except OSError:
+            logger.exception("Scrittura del file metriche non riuscita: %s", metrics_file)
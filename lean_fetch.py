@@ -0,0 +1,90 @@
+import json
+import time
+
+import requests
+from spotipy.exceptions import SpotifyException
+
+from analysis_model import track_row
+from instrumentation import current_metrics
+
+try:
+    import orjson
+except ImportError: # Dipendenza opzionale: senza orjson si usa il modulo json standard
+    orjson = None
+
+# --- FORMATO LEGGERO: PROIEZIONE MINIMA DEI CAMPI E DECODIFICA JSON VELOCE ---
+
+# Solo i campi letti dall'analisi; degli artisti serve il nome (il primo è l'artista principale)
+LEAN_PLAYLIST_ITEMS_FIELDS = 'items(track(id,name,popularity,artists(name),external_ids(isrc))),next,total'
+
+# Campi della modalità precedente: oggetti artista completi (URL, URI, tipo, ID)
+LEGACY_PLAYLIST_ITEMS_FIELDS = (
+    'items.track.id,items.track.name,items.track.artists,items.track.popularity,items.track.external_ids.isrc,next,total'
+)
+
+
+def loads(payload):
+    """Decodifica JSON con orjson se installato, altrimenti con json."""
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def _json_default(value):
+    # Scalari numpy eventualmente rimasti nei risultati
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Tipo non serializzabile in JSON: {type(value).__name__}")
+
+
+def dumps(payload):
+    """Codifica JSON in bytes con orjson se installato, altrimenti con json."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def page_rows(items, offset):
+    """Record compatti degli elementi di una pagina; i local file e gli episodi senza ID vengono saltati."""
+    return [
+        track_row(offset + index + 1, item['track'])
+        for index, item in enumerate(items)
+        if item.get('track') and item['track'].get('id')
+    ]
+
+
+def get_json(sp, url, params=None):
+    """GET sulla sessione del client spotipy, con decodifica veloce del corpo.
+
+    Passa dallo stesso pool di connessioni e dallo stesso scheduler delle chiamate spotipy
+    e solleva SpotifyException sugli errori HTTP, come spotipy. Il tempo di decodifica
+    viene attribuito alle metriche dell'analisi corrente.
+    """
+    if not url.startswith("http"):
+        url = sp.prefix + url
+    try:
+        response = sp._session.get(url, params=params, headers=sp._auth_headers(), timeout=sp.requests_timeout)
+    except requests.exceptions.RetryError:
+        raise SpotifyException(429, -1, f"{url}:\n Max Retries")
+    if response.status_code >= 400:
+        try:
+            message = loads(response.content).get("error", {}).get("message")
+        except ValueError:
+            message = response.text or None
+        raise SpotifyException(response.status_code, -1, f"{response.url}:\n {message}", headers=response.headers)
+
+    started = time.perf_counter()
+    payload = loads(response.content)
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.record_parse(time.perf_counter() - started)
+    return payload
+
+
+def fetch_playlist_page(sp, playlist_id, offset, limit):
+    """Pagina della playlist con la proiezione minima. Restituisce (elementi, record compatti, pagina)."""
+    page = get_json(
+        sp, f"playlists/{playlist_id}/items",
+        params={"fields": LEAN_PLAYLIST_ITEMS_FIELDS, "limit": limit, "offset": offset, "additional_types": "track"}
+    )
+    return len(page['items']), page_rows(page['items'], offset), page
@@ -0,0 +1,200 @@
+import hashlib
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from sqlite_storage import connect
+
+# --- INDICE DI SOVRAPPOSIZIONE TRA PLAYLIST (FIRME MINHASH + LSH SU SQLITE) ---
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "overlap_index.sqlite")
+
+NUM_PERMUTATIONS = 128 # Valori per firma: errore tipico della stima di Jaccard ~ 1/sqrt(128) ≈ 0.09
+LSH_BANDS = 64 # 64 bande da 2 righe: soglia di candidatura ~ (1/64)^(1/2) ≈ 0.125 di Jaccard
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+MAX_CANDIDATES = 50 # Candidati LSH su cui si stima Jaccard dalle firme
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+# Permutazioni fisse h(x) = (a*x + b) mod p: firme confrontabili tra processi e riavvii
+_rng = np.random.default_rng(20240901)
+_PERM_A = _rng.integers(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def _hash_ids(track_ids):
+    """Hash stabile a 32 bit di ogni ID (hash() di Python cambia a ogni processo)."""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(track_id.encode(), digest_size=4).digest(), "little") for track_id in track_ids),
+        dtype=np.uint64, count=len(track_ids)
+    )
+
+
+def minhash_signature(track_ids):
+    """Firma MinHash dell'insieme di ID: il minimo di ogni permutazione, come array uint32."""
+    unique_ids = sorted(set(track_ids))
+    if not unique_ids:
+        return np.full(NUM_PERMUTATIONS, _MAX_HASH, dtype=np.uint32)
+    hashes = _hash_ids(unique_ids)[:, None]
+    # a, x < 2^32: il prodotto sta in uint64; il modulo riporta sotto 2^61 prima di sommare b
+    permuted = ((_PERM_A * hashes) % _MERSENNE_PRIME + _PERM_B) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def estimate_jaccard(signature, other):
+    """Stima di Jaccard: quota di posizioni in cui le due firme coincidono."""
+    return float(np.count_nonzero(signature == other)) / NUM_PERMUTATIONS
+
+
+def _unpack_ids(blob):
+    text = zlib.decompress(blob).decode()
+    return set(text.split("\n")) if text else set()
+
+
+def _band_buckets(signature):
+    """Chiave di bucket (int64 con segno, come gli INTEGER di SQLite) per ciascuna banda."""
+    bands = signature.reshape(LSH_BANDS, LSH_ROWS)
+    return [
+        int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), "little", signed=True)
+        for band in bands
+    ]
+
+
+class OverlapIndex:
+    """Indice locale delle playlist analizzate per trovare quelle con più brani in comune.
+
+    Per ogni playlist salva la firma MinHash, le chiavi LSH delle bande e gli ID dei brani
+    compressi. La ricerca legge solo le playlist che condividono almeno un bucket (costo
+    sub-lineare nel numero di playlist), ordina i candidati per Jaccard stimata e calcola
+    la sovrapposizione esatta solo per i primi `top_k`.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        with connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS playlist_signatures (
+                    playlist_id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    snapshot_id TEXT,
+                    track_count INTEGER NOT NULL,
+                    signature BLOB NOT NULL,
+                    track_ids BLOB NOT NULL,
+                    indexed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lsh_buckets (
+                    band INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    playlist_id TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_lsh_bucket ON lsh_buckets (band, bucket)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_lsh_playlist ON lsh_buckets (playlist_id)")
+
+    def __len__(self):
+        with connect(self.path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM playlist_signatures").fetchone()[0]
+
+    def contains(self, playlist_id, snapshot_id):
+        """True se la playlist è indicizzata con questo `snapshot_id`."""
+        with connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT snapshot_id FROM playlist_signatures WHERE playlist_id = ?", (playlist_id,)
+            ).fetchone()
+        return row is not None and row[0] == snapshot_id
+
+    def add(self, playlist_id, name, snapshot_id, track_ids):
+        """Indicizza (o reindicizza) la playlist a partire dagli ID dei suoi brani."""
+        unique_ids = sorted(set(track_ids))
+        signature = minhash_signature(unique_ids)
+        packed_ids = zlib.compress("\n".join(unique_ids).encode())
+        buckets = _band_buckets(signature) if unique_ids else []
+        with self._lock, connect(self.path) as conn:
+            conn.execute("DELETE FROM lsh_buckets WHERE playlist_id = ?", (playlist_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO playlist_signatures VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (playlist_id, name, snapshot_id, len(unique_ids), signature.tobytes(), packed_ids, time.time())
+            )
+            conn.executemany(
+                "INSERT INTO lsh_buckets VALUES (?, ?, ?)",
+                [(band, bucket, playlist_id) for band, bucket in enumerate(buckets)]
+            )
+
+    def remove(self, playlist_id):
+        with self._lock, connect(self.path) as conn:
+            conn.execute("DELETE FROM lsh_buckets WHERE playlist_id = ?", (playlist_id,))
+            conn.execute("DELETE FROM playlist_signatures WHERE playlist_id = ?", (playlist_id,))
+
+    def most_similar(self, playlist_id, top_k=10, max_candidates=MAX_CANDIDATES):
+        """Playlist indicizzate con più brani in comune con `playlist_id`, dalla più simile.
+
+        Ogni voce contiene `estimated_jaccard` (dalle firme) e `shared_tracks`/`jaccard`
+        esatti. Restituisce una lista vuota se la playlist non è indicizzata.
+        """
+        with connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT signature, track_ids FROM playlist_signatures WHERE playlist_id = ?", (playlist_id,)
+            ).fetchone()
+            if row is None:
+                return []
+            signature = np.frombuffer(row[0], dtype=np.uint32)
+            # Candidati: playlist che condividono almeno un bucket, le più ricorrenti per prime
+            candidates = conn.execute(
+                """
+                SELECT other.playlist_id, COUNT(*) AS shared_bands
+                FROM lsh_buckets AS own
+                JOIN lsh_buckets AS other ON other.band = own.band AND other.bucket = own.bucket
+                WHERE own.playlist_id = ? AND other.playlist_id != own.playlist_id
+                GROUP BY other.playlist_id
+                ORDER BY shared_bands DESC
+                LIMIT ?
+                """,
+                (playlist_id, max_candidates)
+            ).fetchall()
+            if not candidates:
+                return []
+            placeholders = ",".join("?" * len(candidates))
+            rows = conn.execute(
+                f"SELECT playlist_id, name, track_count, signature FROM playlist_signatures "
+                f"WHERE playlist_id IN ({placeholders})",
+                [candidate_id for candidate_id, _ in candidates]
+            ).fetchall()
+
+            ranked = sorted(
+                (
+                    {
+                        "playlist_id": candidate_id,
+                        "name": name,
+                        "track_count": track_count,
+                        "estimated_jaccard": estimate_jaccard(signature, np.frombuffer(blob, dtype=np.uint32)),
+                    }
+                    for candidate_id, name, track_count, blob in rows
+                ),
+                key=lambda entry: entry["estimated_jaccard"],
+                reverse=True
+            )[:top_k]
+
+            # Sovrapposizione esatta solo per i migliori candidati
+            own_ids = _unpack_ids(row[1])
+            for entry in ranked:
+                packed = conn.execute(
+                    "SELECT track_ids FROM playlist_signatures WHERE playlist_id = ?", (entry["playlist_id"],)
+                ).fetchone()[0]
+                other_ids = _unpack_ids(packed)
+                shared = len(own_ids & other_ids)
+                union = len(own_ids | other_ids)
+                entry["shared_tracks"] = shared
+                entry["jaccard"] = round(shared / union, 4) if union else 0.0
+        return sorted(ranked, key=lambda entry: (entry["jaccard"], entry["shared_tracks"]), reverse=True)
+
+    def clear(self):
+        with self._lock, connect(self.path) as conn:
+            conn.execute("DELETE FROM lsh_buckets")
+            conn.execute("DELETE FROM playlist_signatures")
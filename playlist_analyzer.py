@@ -1,8 +1,19 @@
 import streamlit as st
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
 import pandas as pd
 import numpy as np
+import json
+import time
+from analysis_cache import AnalysisCache
+from artist_cache import ArtistCache
+from analysis_jobs import get_job_manager
+from analysis_model import SCORE_BAND_LABELS
+from result_store import get_result_store
+from instrumentation import REGISTRY, STAGES
+from overlap_index import OverlapIndex
+from popularity_history import PopularityHistory
+from request_scheduler import get_scheduler
+from spotify_client import DEFAULT_POOL_SIZE
+from track_list_html import TRACK_LIST_HEADER, build_track_rows_html
 
 # --- CONFIGURAZIONE PAGINA E CSS ---
 st.set_page_config(page_title="Spotify Popularity Analyzer", layout="centered", page_icon="🎵")
@@ -11,10 +22,12 @@ st.set_page_config(page_title="Spotify Popularity Analyzer", layout="centered",
 try:
     SPOTIFY_CLIENT_ID = st.secrets["spotify"]["client_id"]
     SPOTIFY_CLIENT_SECRET = st.secrets["spotify"]["client_secret"]
+    SPOTIFY_POOL_SIZE = int(st.secrets["spotify"].get("pool_size", DEFAULT_POOL_SIZE))
     credentials_ok = True
 except:
     SPOTIFY_CLIENT_ID = None
     SPOTIFY_CLIENT_SECRET = None
+    SPOTIFY_POOL_SIZE = DEFAULT_POOL_SIZE
     credentials_ok = False
     
 # Custom CSS per lo stile Soundvertise (Viola/Azzurro/Scuro)
@@ -199,185 +212,51 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- FUNZIONE BACKEND UNIFICATA ---
+# --- CACHE CONDIVISA E RENDERING LISTE ---
 
-def get_analysis_data(analysis_type, identifier, client_id, client_secret):
-    """Esegue l'analisi unificata per Playlist o Artista."""
-    
-    auth_manager = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret)
-    sp = spotipy.Spotify(auth_manager=auth_manager)
-    
-    all_tracks_data = []
-    track_identifiers = set() 
-    
-    if analysis_type == "Playlist":
-        # Pulizia URL per ottenere ID
-        playlist_id = identifier.split("/")[-1].split("?")[0]
-        
-        try:
-            # 1. Ottieni i metadati della playlist (nome, immagine)
-            metadata = sp.playlist(playlist_id, fields='name,images')
-            name = metadata['name']
-            image_url = metadata['images'][0]['url'] if metadata['images'] else None
-
-            # 2. Ottieni tutti gli elementi della playlist (gestione della paginazione)
-            tracks_results = sp.playlist_items(playlist_id, fields='items.track.id,items.track.name,items.track.artists,items.track.popularity,next')
-            tracks_list = []
-            
-            while tracks_results:
-                tracks_list.extend(tracks_results['items'])
-                tracks_results = sp.next(tracks_results)
-
-            # 3. Processa tutti i brani
-            for index, item in enumerate(tracks_list):
-                track = item.get('track')
-                if track and track.get('id'): 
-                    track_id = track['id']
-                    
-                    # Rilevamento duplicati 
-                    is_duplicate = track_id in track_identifiers
-                    track_identifiers.add(track_id)
-
-                    all_tracks_data.append({
-                        "position": index + 1,
-                        "name": track['name'],
-                        "artist": track['artists'][0]['name'],
-                        "score": track['popularity'],
-                        "is_duplicate": is_duplicate
-                    })
-        except Exception as e:
-            return {"error": f"ID/URL Playlist non valido o errore API: {e}"}
-                
-    elif analysis_type == "Artista":
-        artist_id = None
-        
-        # 1. Trova l'ID dell'artista (URL, URI o Ricerca)
-        if "spotify.com/artist/" in identifier:
-            artist_id = identifier.split("/")[-1].split("?")[0]
-        elif identifier.startswith("spotify:artist:"):
-            artist_id = identifier.split(":")[-1]
-        
-        artist = None
-        
-        if artist_id:
-            try:
-                artist = sp.artist(artist_id)
-            except Exception:
-                artist_id = None 
-
-        if not artist_id:
-            results = sp.search(q='artist:' + identifier, type='artist')
-            items = results['artists']['items']
-            if not items:
-                return {"error": f"Artista non trovato con il nome o l'URL/ID fornito: {identifier}"}
-            artist = items[0]
-            artist_id = artist['id']
-        
-        # 2. Ottieni i metadati
-        name = f"Top 50 Tracks di {artist['name']}" # TITOLO AGGIORNATO
-        image_url = artist['images'][0]['url'] if artist['images'] else None
-        
-        # 3. RECUPERO TRACCE: Usa Top Tracks Globali (limite max 50) per stabilità e rilevanza
-        
-        # Ottiene le top track globali (max 50) 
-        top_tracks_results = sp.artist_top_tracks(artist_id)['tracks']
-        
-        # Gestione della paginazione per Top Tracks (anche se limitata a 50)
-        tracks_list = []
-        for track in top_tracks_results:
-             # Ottiene informazioni dettagliate sul brano, inclusa la popolarità globale
-             tracks_list.append(sp.track(track['id']))
-
-
-        for index, track in enumerate(tracks_list):
-            if track:
-                track_id = track['id']
-                
-                # Rilevamento duplicati (anche se raro nelle Top Tracks, è un buon controllo)
-                is_duplicate = track_id in track_identifiers
-                track_identifiers.add(track_id)
-
-                all_tracks_data.append({
-                    "position": index + 1,
-                    "name": track['name'],
-                    "artist": track['artists'][0]['name'],
-                    "score": track['popularity'],
-                    "is_duplicate": is_duplicate
-                })
-
-    # Calcolo della Popolarità Media
-    total_pop = sum(t['score'] for t in all_tracks_data)
-    avg_pop = int(total_pop / len(all_tracks_data)) if all_tracks_data else 0
-    
-    # Calcolo dei duplicati totali
-    total_duplicates = sum(1 for t in all_tracks_data if t['is_duplicate'])
-
-    return {
-        "name": name,
-        "avg_pop": avg_pop,
-        "all_tracks_data": all_tracks_data,
-        "total_tracks": len(all_tracks_data),
-        "image_url": image_url,
-        "total_duplicates": total_duplicates
-    }
-    
-def _get_score_classes(score):
-    """Determina le classi CSS per lo score in base a 9 intervalli."""
-    if score >= 90:
-        return 'fill-c9-bg', 'bar-c9'
-    elif score >= 78:
-        return 'fill-c8-bg', 'bar-c8'
-    elif score >= 67:
-        return 'fill-c7-bg', 'bar-c7'
-    elif score >= 56:
-        return 'fill-c6-bg', 'bar-c6'
-    elif score >= 45:
-        return 'fill-c5-bg', 'bar-c5'
-    elif score >= 34:
-        return 'fill-c4-bg', 'bar-c4'
-    elif score >= 23:
-        return 'fill-c3-bg', 'bar-c3'
-    elif score >= 12:
-        return 'fill-c2-bg', 'bar-c2'
-    else:
-        return 'fill-c1-bg', 'bar-c1'
+@st.cache_resource
+def _get_analysis_cache():
+    """Cache su disco condivisa da tutte le sessioni del processo."""
+    return AnalysisCache()
 
-def _render_track_with_bar(track):
-    """Helper function per il rendering del brano con barre sottili e numeri colorati."""
-    score = track['score']
-    
-    # 1. Determinazione classi colore
-    score_class, bar_color = _get_score_classes(score)
-        
-    name_class = 'low-track-name' if score < 20 else ''
-    
-    artist_name = track['artist']
-    song_name = track['name']
-    
-    duplicate_tag = " (DUPLICATO)" if track.get('is_duplicate') else ""
-    duplicate_class = "duplicate-name" if track.get('is_duplicate') else name_class
-    duplicate_row_class = "is-duplicate" if track.get('is_duplicate') else "" 
-    
-    bar_width = max(score, 3) # Larghezza minima per visualizzazione
-
-    # Struttura HTML pulita (solo indice, nome e punteggio colorato)
-    track_html = f"""
-    <div class="track-item-clean {duplicate_row_class}">
-        <span class="track-index">#{track['position']}</span>
-        <div class="track-name-artist">
-            <span class="{duplicate_class}">{song_name}{duplicate_tag}</span> <br> <i style='color:#a0a0b0'>{artist_name}</i>
-        </div>
-        <div class="score-container-detail">
-            <div class="score-bar-small">
-                <div class="score-bar-fill {bar_color}" style="width: {bar_width}%;"></div>
-            </div>
-            <span class="track-score-value-clean {score_class}">
-                {score}
-            </span>
-        </div>
-    </div>
+@st.cache_resource
+def _get_artist_cache():
+    """Risoluzione nome/URL/URI -> artista condivisa da tutte le sessioni del processo."""
+    return ArtistCache()
+
+@st.cache_resource
+def _get_overlap_index():
+    """Indice locale delle playlist analizzate, per il confronto delle sovrapposizioni."""
+    return OverlapIndex()
+
+@st.cache_resource
+def _get_popularity_history():
+    """Storico locale degli score dei brani, per l'andamento della popolarità delle playlist."""
+    return PopularityHistory()
+
+TRACK_LIST_PAGE_SIZE = 100 # Righe disegnate per pagina nelle liste brani
+JOB_POLL_SECONDS = 0.5 # Attesa massima tra due controlli del job in background
+
+def _render_track_list(tracks, key, max_height):
+    """Disegna la lista brani con un solo elemento markdown, paginata a TRACK_LIST_PAGE_SIZE righe.
+
+    Solo le righe della pagina selezionata vengono generate e inviate al browser.
     """
-    return track_html
+    total_pages = max(1, -(-len(tracks) // TRACK_LIST_PAGE_SIZE))
+    page = 1
+    if total_pages > 1:
+        page = st.number_input(
+            f"Pagina (1-{total_pages}, {TRACK_LIST_PAGE_SIZE} brani per pagina)",
+            min_value=1, max_value=total_pages, value=1, step=1, key=key
+        )
+    start = (int(page) - 1) * TRACK_LIST_PAGE_SIZE
+    visible = tracks[start:start + TRACK_LIST_PAGE_SIZE]
+
+    st.markdown(
+        f'<div class="css-card" style="max-height: {max_height}px; overflow-y: auto;">'
+        f'{TRACK_LIST_HEADER}{build_track_rows_html(visible)}</div>',
+        unsafe_allow_html=True
+    )
 
 # --- UI COMPONENTS ---
 
@@ -393,8 +272,10 @@ with st.container():
     # Selettore Artista/Playlist
     analysis_type = st.radio(
         "Seleziona il tipo di analisi:",
-        ("Playlist", "Artista"),
-        horizontal=True
+        ("Playlist", "Artista", "Catalogo Artista"),
+        horizontal=True,
+        help="Artista: top tracks dell'artista. Catalogo Artista: tutti gli album e i singoli, "
+             "con ogni brano contato una sola volta anche se pubblicato su più uscite."
     )
     
     if analysis_type == "Playlist":
@@ -408,10 +289,13 @@ with st.container():
         st.error("🔒 **Errore:** Credenziali Spotify non trovate. Configura `secrets.toml`.")
 
 
-    if 'data' not in st.session_state:
-         st.session_state['data'] = None
+    # La sessione conserva solo l'ID del risultato: i dati stanno nell'archivio del processo
+    if 'data_id' not in st.session_state:
+         st.session_state['data_id'] = None
 
     analyze_btn = st.button(f"🚀 Analizza {analysis_type} Popularity")
+    # Pannello tecnico opzionale (attivabile anche con ?debug=1 nell'URL)
+    debug_mode = st.toggle("🛠️ Pannello debug (tempi e chiamate API)", value=st.query_params.get("debug") == "1")
     st.markdown('</div>', unsafe_allow_html=True)
 
 # 2. Popularity Score Explanation (Collassabile)
@@ -436,19 +320,63 @@ if analyze_btn:
     elif not identifier:
         st.warning(f"Per favore, inserisci un ID o URL {analysis_type} valido.")
     else:
-        with st.spinner(f"Analisi {analysis_type} e calcolo punteggio..."):
-            
-            analysis_data = get_analysis_data(analysis_type, identifier, SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
-            
-            if "error" in analysis_data:
-                st.error(f"Errore Spotify: {analysis_data['error']}")
-            else:
-                st.session_state['data'] = analysis_data
-                st.rerun()
+        # L'analisi gira nell'esecutore di processo: richieste identiche condividono lo stesso job
+        st.session_state['analysis_job'] = get_job_manager().submit(
+            analysis_type, identifier, SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET,
+            cache=_get_analysis_cache(), pool_size=SPOTIFY_POOL_SIZE, overlap_index=_get_overlap_index(),
+            artist_cache=_get_artist_cache(), history=_get_popularity_history()
+        )
+
+# Il job sopravvive ai rerun: la sessione continua a seguirlo finché non termina
+analysis_job = st.session_state.get('analysis_job')
+if analysis_job is not None:
+    # Risultati parziali aggiornati a ogni pagina ricevuta, al posto del solo spinner
+    progress_bar = st.progress(0.0, text="Analisi e calcolo punteggio...")
+    live_panel = st.empty()
+    version, done = 0, False
+
+    while not done:
+        version, update, done = analysis_job.poll(version, timeout=JOB_POLL_SECONDS)
+        if done or update is None:
+            continue
+
+        expected = update['expected_items'] or 0
+        fraction = min(update['fetched_items'] / expected, 1.0) if expected else 0.0
+        progress_bar.progress(fraction, text=f"Brani ricevuti: {update['fetched_items']}/{expected or '?'}")
+        with live_panel.container():
+            col_avg, col_dup, col_low = st.columns(3)
+            col_avg.metric("Popolarità media (parziale)", f"{update['avg_pop']}/100")
+            col_dup.metric("Duplicati", update['total_duplicates'])
+            col_low.metric("Brani con Score < 20", update['low_score_count'])
+            # Ultimi brani a rischio trovati, senza widget per non duplicare le chiavi
+            recent_low = update['recent_low_tracks']
+            if recent_low:
+                st.markdown(
+                    f'<div class="css-card">{TRACK_LIST_HEADER}{build_track_rows_html(recent_low)}</div>',
+                    unsafe_allow_html=True
+                )
+
+    progress_bar.empty()
+    live_panel.empty()
+    del st.session_state['analysis_job']
+
+    analysis_data = analysis_job.result()
+    if "error" in analysis_data:
+        st.error(f"Errore Spotify: {analysis_data['error']}")
+    else:
+        # Il job ha già salvato il risultato nell'archivio: è condiviso con le sessioni della stessa analisi
+        st.session_state['data_id'] = analysis_data['result_id']
+        st.session_state['shared_requests'] = analysis_job.subscribers
+        st.rerun()
 
 # 3. Results Display (NUOVA STRUTTURA: Score imponente + Artwork centrato)
-if 'data' in st.session_state and st.session_state['data']:
-    data = st.session_state['data']
+data = get_result_store().get(st.session_state['data_id']) if st.session_state.get('data_id') else None
+if st.session_state.get('data_id') and data is None:
+    st.warning("Il risultato dell'analisi precedente non è più disponibile: avvia di nuovo l'analisi.")
+    st.session_state['data_id'] = None
+
+if data:
+    render_started = time.perf_counter()
     
     st.markdown(f"### 📈 Risultati Analisi per: {data['name']} ({data['total_tracks']} Tracks)")
     
@@ -492,6 +420,40 @@ if 'data' in st.session_state and st.session_state['data']:
     # Badge Duplicati
     total_duplicates = data.get('total_duplicates', 0)
     st.info(f"📋 **Conteggio Duplicati:** Trovati **{total_duplicates}** brani duplicati in questa analisi.")
+    rule_counts = data.get('duplicate_rule_counts') or {}
+    if rule_counts.get('isrc') or rule_counts.get('title_artist'):
+        st.caption(
+            f"Di cui stesso ID: {rule_counts.get('id', 0)} · stesso ISRC: {rule_counts.get('isrc', 0)} · "
+            f"stesso titolo e artista: {rule_counts.get('title_artist', 0)}"
+        )
+    if 'releases' in data:
+        st.caption(
+            f"Uscite analizzate (album e singoli): {data['releases']} · brani ripubblicati su più uscite "
+            f"contati una volta: {data['cross_release_duplicates']}"
+        )
+    cache_note = " (risultato dalla cache: playlist invariata)" if data.get('from_cache') else ""
+    shared_requests = st.session_state.get('shared_requests', 1)
+    if shared_requests > 1:
+        cache_note += f" (analisi condivisa da {shared_requests} richieste identiche)"
+    st.caption(f"Chiamate API Spotify per questa analisi: {data.get('api_calls', 0)}{cache_note}")
+    scheduler_stats = get_scheduler().stats()
+    st.caption(
+        f"Scheduler richieste (processo): coda {scheduler_stats['queue_depth']}, "
+        f"concorrenza {scheduler_stats['in_flight']}/{scheduler_stats['concurrency_limit']}, "
+        f"429 ricevuti {scheduler_stats['throttled']}, retry {scheduler_stats['retries']}"
+    )
+
+    # Distribuzione degli score: percentili, dispersione e brani per fascia
+    distribution = data.get('distribution')
+    if distribution and distribution['count']:
+        st.markdown("### 📊 Distribuzione della Popolarità")
+        col_p10, col_median, col_p90, col_std = st.columns(4)
+        col_p10.metric("P10", distribution['p10'])
+        col_median.metric("Mediana", distribution['median'])
+        col_p90.metric("P90", distribution['p90'])
+        col_std.metric("Deviazione std", distribution['std'])
+        st.bar_chart(pd.DataFrame({"Fascia": SCORE_BAND_LABELS, "Brani": distribution['band_counts']}),
+                     x="Fascia", y="Brani")
 
     # 3.2 Artwork Centrato sotto il Punteggio
     st.markdown('<div class="css-card" style="padding: 15px; text-align: center;">', unsafe_allow_html=True)
@@ -504,40 +466,104 @@ if 'data' in st.session_state and st.session_state['data']:
 
 
     # 3.3 Low Popularity Tracks (< 20 Score)
-    low_risk_tracks = [t for t in data['all_tracks_data'] if t['score'] < 20]
+    low_risk_tracks = data['all_tracks_data'].low_score_tracks()
     
     st.markdown("### 📉 Low Popularity Tracks (Score < 20)") # TESTO AGGIORNATO
     
     if low_risk_tracks:
         st.warning(f"Trovati **{len(low_risk_tracks)}** brani con engagement estremamente basso. **Si suggerisce la Rimozione.**")
-        st.markdown('<div class="css-card" style="max-height: 250px; overflow-y: auto;">', unsafe_allow_html=True)
-        # Intestazioni per la lista a rischio
-        st.markdown("""
-        <div class="track-list-header">
-            <span style="text-align: right;">POS.</span>
-            <span style="margin-left: 10px;">SONG / ARTIST</span>
-            <span style="text-align: right;">SCORE</span>
-        </div>
-        """, unsafe_allow_html=True)
-        for track in low_risk_tracks:
-            st.markdown(_render_track_with_bar(track), unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+        _render_track_list(low_risk_tracks, key="low_tracks_page", max_height=250)
     else:
         st.success("Nessun brano a bassa popolarità trovato (Score < 20). Ottima salute per la tua analisi!")
 
     # 3.4 Detailed Track Breakdown (All Tracks)
     st.markdown("### ⬇️ Dettaglio Completo Brani - Positions")
-    st.markdown('<div class="css-card" style="max-height: 450px; overflow-y: auto;">', unsafe_allow_html=True)
-    
-    # Intestazioni per la lista completa
-    st.markdown("""
-    <div class="track-list-header">
-        <span style="text-align: right;">POS.</span>
-        <span style="margin-left: 10px;">SONG / ARTIST</span>
-        <span style="text-align: right;">SCORE</span>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    for track in data['all_tracks_data']:
-        st.markdown(_render_track_with_bar(track), unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
+    _render_track_list(data['all_tracks_data'], key="all_tracks_page", max_height=450)
+
+    # 3.5 Confronto con le altre playlist già analizzate (indice locale MinHash)
+    if data.get('playlist_id'):
+        st.markdown("### 🔗 Playlist Simili (già analizzate)")
+        similar = _get_overlap_index().most_similar(data['playlist_id'])
+        if similar:
+            st.dataframe(pd.DataFrame([
+                {
+                    "Playlist": entry['name'],
+                    "Brani": entry['track_count'],
+                    "Brani in comune": entry['shared_tracks'],
+                    "Jaccard": entry['jaccard'],
+                    "Jaccard stimata": round(entry['estimated_jaccard'], 3),
+                }
+                for entry in similar
+            ]), hide_index=True)
+        else:
+            st.caption("Nessuna playlist analizzata finora ha brani in comune con questa.")
+
+        # Andamento della popolarità tra le analisi registrate nello storico locale
+        st.markdown("### 📈 Andamento della Popolarità")
+        history = _get_popularity_history()
+        trend = history.playlist_trend(data['playlist_id'])
+        if len(trend) < 2:
+            st.caption("L'andamento sarà disponibile dalla prossima analisi registrata di questa playlist.")
+        else:
+            trend_frame = pd.DataFrame(trend)
+            trend_frame['Data'] = pd.to_datetime(trend_frame['recorded_at'], unit='s')
+            st.line_chart(trend_frame.rename(columns={'avg_pop': 'Popolarità media'}),
+                          x='Data', y='Popolarità media')
+            movers = history.top_movers(data['playlist_id'])
+            if movers:
+                st.caption("Brani con la variazione più ampia dall'analisi precedente:")
+                st.dataframe(pd.DataFrame([
+                    {
+                        "Brano": entry['name'],
+                        "Artista": entry['artist'],
+                        "Prima": entry['previous_score'],
+                        "Ora": entry['score'],
+                        "Variazione": entry['delta'],
+                    }
+                    for entry in movers
+                ]), hide_index=True)
+                selected = st.selectbox(
+                    "Andamento del brano", range(len(movers)),
+                    format_func=lambda index: f"{movers[index]['name']} - {movers[index]['artist']}"
+                )
+                track_points = history.track_history(data['playlist_id'], movers[selected]['track_id'])
+                # Lo storico salva solo le variazioni: il punto finale riporta lo score attuale a oggi
+                track_points.append((trend[-1]['recorded_at'], movers[selected]['score']))
+                track_frame = pd.DataFrame(track_points, columns=['recorded_at', 'Score'])
+                track_frame['Data'] = pd.to_datetime(track_frame['recorded_at'], unit='s')
+                st.line_chart(track_frame, x='Data', y='Score')
+            else:
+                st.caption("Nessuno score è cambiato dall'analisi precedente.")
+
+    render_seconds = time.perf_counter() - render_started
+    REGISTRY.record_stage("render", render_seconds)
+
+    # 3.6 Pannello debug: tempi per fase e contatori HTTP dell'ultima analisi
+    if debug_mode:
+        metrics = dict(data.get('metrics') or {})
+        stages = dict(metrics.get('stages') or {})
+        stages['render'] = round(render_seconds, 4)
+        metrics['stages'] = stages
+        with st.expander("🛠️ Debug: tempi per fase e chiamate API", expanded=True):
+            st.table(pd.DataFrame(
+                [{"fase": stage, "secondi": stages[stage]} for stage in STAGES if stage in stages]
+            ))
+            col_req, col_bytes, col_parse, col_retry = st.columns(4)
+            col_req.metric("Richieste HTTP", metrics.get('http_requests', 0))
+            col_bytes.metric("KB ricevuti", round(metrics.get('bytes_received', 0) / 1024, 1))
+            col_parse.metric("Parse JSON (ms)", round(metrics.get('parse_seconds', 0) * 1000, 1))
+            col_retry.metric("Retry (429/5xx)", metrics.get('retries', 0))
+            store_stats = get_result_store().stats()
+            st.caption(
+                f"Archivio risultati (processo): {store_stats['in_memory']} in memoria, "
+                f"{store_stats['memory_bytes'] / 1024 / 1024:.1f}/{store_stats['memory_budget_bytes'] / 1024 / 1024:.0f} MB, "
+                f"{store_stats['spills']} scaricati su disco, {store_stats['reloads']} ricaricati"
+            )
+            st.download_button(
+                "Scarica metriche (JSON)", json.dumps(metrics, indent=2),
+                file_name="analysis_metrics.json", mime="application/json"
+            )
+            st.download_button(
+                "Scarica metriche di processo (Prometheus)", REGISTRY.render_prometheus(),
+                file_name="analyzer_metrics.prom", mime="text/plain"
+            )
@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+
+from sqlite_storage import connect
+
+# --- STORICO DELLA POPOLARITÀ DELLE PLAYLIST (SNAPSHOT DELTA SU SQLITE) ---
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "popularity_history.sqlite")
+DEFAULT_MIN_INTERVAL_SECONDS = 12 * 60 * 60 # Una registrazione ogni 12 ore basta per gli andamenti giornalieri
+
+
+class PopularityHistory:
+    """Storico locale degli score dei brani di ogni playlist, una registrazione per analisi.
+
+    Ogni registrazione (run) salva solo i brani il cui score è cambiato rispetto alla
+    precedente, i nuovi brani e quelli rimossi (score NULL): lo stato completo di una
+    playlist esiste una volta sola (`playlist_state`), non una copia per giorno. Gli ID
+    dei brani sono memorizzati una volta in `history_tracks` e referenziati da un intero.
+    Gli indici su (brano, run) e (playlist, data) rendono veloci gli andamenti per brano
+    e per playlist.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH, min_interval_seconds=DEFAULT_MIN_INTERVAL_SECONDS):
+        self.path = path
+        self.min_interval_seconds = min_interval_seconds
+        self._lock = threading.Lock()
+        with connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history_tracks (
+                    track_key INTEGER PRIMARY KEY,
+                    track_id TEXT NOT NULL UNIQUE,
+                    name TEXT NOT NULL,
+                    artist TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history_runs (
+                    run_id INTEGER PRIMARY KEY,
+                    playlist_id TEXT NOT NULL,
+                    snapshot_id TEXT,
+                    recorded_at REAL NOT NULL,
+                    track_count INTEGER NOT NULL,
+                    avg_pop REAL NOT NULL,
+                    changed_tracks INTEGER NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_runs_playlist ON history_runs (playlist_id, recorded_at)")
+            # Variazioni: score NULL indica un brano uscito dalla playlist in quel run
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS score_changes (
+                    run_id INTEGER NOT NULL,
+                    track_key INTEGER NOT NULL,
+                    score INTEGER,
+                    PRIMARY KEY (run_id, track_key)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_score_changes_track ON score_changes (track_key, run_id)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS playlist_state (
+                    playlist_id TEXT NOT NULL,
+                    track_key INTEGER NOT NULL,
+                    score INTEGER NOT NULL,
+                    PRIMARY KEY (playlist_id, track_key)
+                ) WITHOUT ROWID
+            """)
+
+    def is_due(self, playlist_id, now=None):
+        """True se l'ultima registrazione della playlist è più vecchia di `min_interval_seconds`."""
+        now = time.time() if now is None else now
+        with connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT MAX(recorded_at) FROM history_runs WHERE playlist_id = ?", (playlist_id,)
+            ).fetchone()
+        return row[0] is None or now - row[0] >= self.min_interval_seconds
+
+    def record(self, playlist_id, snapshot_id, track_ids, names, artists, scores, avg_pop, track_count,
+               recorded_at=None):
+        """Registra gli score correnti della playlist. Restituisce (run_id, brani cambiati).
+
+        Le colonne sono quelle di RunningTrackStats; nei delta un brano presente più volte
+        conta una volta. `avg_pop` e `track_count` sono quelli del risultato dell'analisi
+        (tutte le righe, duplicati compresi), così l'andamento coincide con il punteggio mostrato.
+        """
+        recorded_at = time.time() if recorded_at is None else recorded_at
+        current = {}
+        for track_id, name, artist, score in zip(track_ids, names, artists, scores):
+            current.setdefault(track_id, (name, artist, score))
+        with self._lock, connect(self.path) as conn:
+            previous = {
+                track_id: (track_key, score)
+                for track_id, track_key, score in conn.execute(
+                    "SELECT t.track_id, s.track_key, s.score FROM playlist_state AS s "
+                    "JOIN history_tracks AS t ON t.track_key = s.track_key WHERE s.playlist_id = ?",
+                    (playlist_id,)
+                )
+            }
+            new_ids = [track_id for track_id in current if track_id not in previous]
+            conn.executemany(
+                "INSERT OR IGNORE INTO history_tracks (track_id, name, artist) VALUES (?, ?, ?)",
+                [(track_id,) + current[track_id][:2] for track_id in new_ids]
+            )
+            keys = {track_id: track_key for track_id, (track_key, _) in previous.items()}
+            for track_id in new_ids:
+                keys[track_id] = conn.execute(
+                    "SELECT track_key FROM history_tracks WHERE track_id = ?", (track_id,)
+                ).fetchone()[0]
+
+            changes = [
+                (keys[track_id], score) for track_id, (_, _, score) in current.items()
+                if track_id not in previous or previous[track_id][1] != score
+            ]
+            removed = [track_key for track_id, (track_key, _) in previous.items() if track_id not in current]
+            run_id = conn.execute(
+                "INSERT INTO history_runs (playlist_id, snapshot_id, recorded_at, track_count, avg_pop, changed_tracks) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (playlist_id, snapshot_id, recorded_at, track_count, avg_pop, len(changes) + len(removed))
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO score_changes VALUES (?, ?, ?)",
+                [(run_id, track_key, score) for track_key, score in changes]
+                + [(run_id, track_key, None) for track_key in removed]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO playlist_state VALUES (?, ?, ?)",
+                [(playlist_id, track_key, score) for track_key, score in changes]
+            )
+            conn.executemany(
+                "DELETE FROM playlist_state WHERE playlist_id = ? AND track_key = ?",
+                [(playlist_id, track_key) for track_key in removed]
+            )
+        return run_id, len(changes) + len(removed)
+
+    def playlist_trend(self, playlist_id, limit=None):
+        """Registrazioni della playlist dalla più vecchia: data, brani, popolarità media, brani cambiati."""
+        with connect(self.path) as conn:
+            rows = conn.execute(
+                "SELECT run_id, recorded_at, snapshot_id, track_count, avg_pop, changed_tracks FROM history_runs "
+                "WHERE playlist_id = ? ORDER BY recorded_at DESC LIMIT ?",
+                (playlist_id, -1 if limit is None else limit)
+            ).fetchall()
+        return [
+            {"run_id": run_id, "recorded_at": recorded_at, "snapshot_id": snapshot_id, "track_count": track_count,
+             "avg_pop": avg_pop, "changed_tracks": changed_tracks}
+            for run_id, recorded_at, snapshot_id, track_count, avg_pop, changed_tracks in reversed(rows)
+        ]
+
+    def track_history(self, playlist_id, track_id):
+        """Punti di variazione dello score del brano nella playlist: [(data, score o None se rimosso)].
+
+        Lo score resta invariato tra un punto e il successivo.
+        """
+        with connect(self.path) as conn:
+            return conn.execute(
+                "SELECT r.recorded_at, c.score FROM history_tracks AS t "
+                "JOIN score_changes AS c ON c.track_key = t.track_key "
+                "JOIN history_runs AS r ON r.run_id = c.run_id "
+                "WHERE t.track_id = ? AND r.playlist_id = ? ORDER BY c.run_id",
+                (track_id, playlist_id)
+            ).fetchall()
+
+    def top_movers(self, playlist_id, since_run_id=None, top_k=10):
+        """Brani della playlist con la variazione di score più ampia rispetto a un run precedente.
+
+        Senza `since_run_id` il confronto è con il penultimo run. Lo score di allora è
+        l'ultima variazione registrata fino a quel run (ricostruzione dai delta).
+        """
+        with connect(self.path) as conn:
+            if since_run_id is None:
+                row = conn.execute(
+                    "SELECT run_id FROM history_runs WHERE playlist_id = ? ORDER BY run_id DESC LIMIT 1 OFFSET 1",
+                    (playlist_id,)
+                ).fetchone()
+                if row is None:
+                    return []
+                since_run_id = row[0]
+            rows = conn.execute(
+                """
+                SELECT t.track_id, t.name, t.artist, s.score, (
+                    SELECT c.score FROM score_changes AS c JOIN history_runs AS r ON r.run_id = c.run_id
+                    WHERE c.track_key = s.track_key AND r.playlist_id = s.playlist_id AND c.run_id <= ?
+                    ORDER BY c.run_id DESC LIMIT 1
+                ) AS previous_score
+                FROM playlist_state AS s JOIN history_tracks AS t ON t.track_key = s.track_key
+                WHERE s.playlist_id = ?
+                """,
+                (since_run_id, playlist_id)
+            ).fetchall()
+        movers = [
+            {"track_id": track_id, "name": name, "artist": artist, "previous_score": previous_score,
+             "score": score, "delta": score - previous_score}
+            for track_id, name, artist, score, previous_score in rows
+            if previous_score is not None and previous_score != score
+        ]
+        return sorted(movers, key=lambda entry: abs(entry["delta"]), reverse=True)[:top_k]
+
+    def remove(self, playlist_id):
+        with self._lock, connect(self.path) as conn:
+            conn.execute(
+                "DELETE FROM score_changes WHERE run_id IN (SELECT run_id FROM history_runs WHERE playlist_id = ?)",
+                (playlist_id,)
+            )
+            conn.execute("DELETE FROM history_runs WHERE playlist_id = ?", (playlist_id,))
+            conn.execute("DELETE FROM playlist_state WHERE playlist_id = ?", (playlist_id,))
+
+    def clear(self):
+        with self._lock, connect(self.path) as conn:
+            for table in ("score_changes", "history_runs", "playlist_state", "history_tracks"):
+                conn.execute(f"DELETE FROM {table}")
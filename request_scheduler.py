@@ -0,0 +1,204 @@
+import email.utils
+import random
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RetryError
+
+from instrumentation import record_http_response, record_http_retry
+
+# --- SCHEDULER DELLE RICHIESTE SPOTIFY (RATE LIMIT, RETRY-AFTER, CONCORRENZA ADATTIVA) ---
+
+DEFAULT_RATE_PER_SECOND = 20.0 # Richieste al secondo concesse dal token bucket
+DEFAULT_BURST = 20 # Capacità del token bucket
+DEFAULT_INITIAL_CONCURRENCY = 8
+DEFAULT_MIN_CONCURRENCY = 1
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_MAX_RETRIES = 5 # Tentativi aggiuntivi dopo una risposta 429
+DEFAULT_RETRY_AFTER = 1.0 # Attesa usata se la risposta 429 non indica Retry-After
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+SUCCESSES_PER_INCREASE = 20 # Risposte consecutive senza 429 prima di aumentare la concorrenza
+
+
+def parse_retry_after(value, default=DEFAULT_RETRY_AFTER):
+    """Converte l'header Retry-After (secondi o data HTTP) in secondi di attesa."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RequestScheduler:
+    """Coordina tutte le richieste Spotify del processo.
+
+    Ogni richiesta consuma un token del bucket e occupa uno slot di concorrenza. Una
+    risposta 429 blocca tutte le richieste fino allo scadere di Retry-After e dimezza il
+    limite di concorrenza; serie di risposte senza 429 lo rialzano di uno (AIMD).
+    """
+
+    def __init__(self, rate_per_second=DEFAULT_RATE_PER_SECOND, burst=DEFAULT_BURST,
+                 initial_concurrency=DEFAULT_INITIAL_CONCURRENCY, min_concurrency=DEFAULT_MIN_CONCURRENCY,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, max_retries=DEFAULT_MAX_RETRIES):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._concurrency_limit = initial_concurrency
+        self._in_flight = 0
+        self._waiting = 0
+        self._success_streak = 0
+
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.giveups = 0
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate_per_second)
+
+    def acquire(self):
+        """Attende token, slot libero e fine di un eventuale blocco Retry-After."""
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now < self._blocked_until:
+                        timeout = self._blocked_until - now
+                    elif self._in_flight >= self._concurrency_limit:
+                        timeout = None # Risvegliato da release()
+                    elif self._tokens < 1:
+                        timeout = (1 - self._tokens) / self.rate_per_second
+                    else:
+                        self._tokens -= 1
+                        self._in_flight += 1
+                        self.requests += 1
+                        return
+                    self._cond.wait(timeout)
+            finally:
+                self._waiting -= 1
+
+    def release(self, throttled=False, retry_after=None):
+        """Libera lo slot e aggiorna il limite di concorrenza in base all'esito."""
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self.throttled += 1
+                self._success_streak = 0
+                self._blocked_until = max(self._blocked_until, now + (retry_after or 0.0))
+                # Un solo dimezzamento per raffica di 429 ricevuti insieme
+                if now - self._last_decrease > 1.0:
+                    self._concurrency_limit = max(self.min_concurrency, self._concurrency_limit // 2)
+                    self._last_decrease = now
+            else:
+                self._success_streak += 1
+                if self._success_streak >= SUCCESSES_PER_INCREASE and self._concurrency_limit < self.max_concurrency:
+                    self._concurrency_limit += 1
+                    self._success_streak = 0
+            self._cond.notify_all()
+
+    def record(self, counter):
+        """Incrementa un contatore (`retries` o `giveups`) sotto lock."""
+        with self._cond:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def backoff_delay(self, attempt):
+        """Attesa casuale aggiuntiva (full jitter) per non far ripartire i retry tutti insieme."""
+        return random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * (2 ** attempt)))
+
+    def stats(self):
+        """Stato osservabile dello scheduler."""
+        with self._cond:
+            return {
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "concurrency_limit": self._concurrency_limit,
+                "blocked_for": round(max(0.0, self._blocked_until - time.monotonic()), 3),
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "giveups": self.giveups,
+            }
+
+
+def _exhausted_retries(retry):
+    """Tentativi ripetuti da urllib3 quando il suo Retry si esaurisce (total o status)."""
+    limits = [limit for limit in (retry.total, retry.status) if isinstance(limit, int)]
+    return min(limits) if limits else 0
+
+
+class ScheduledHTTPAdapter(HTTPAdapter):
+    """Adapter requests che fa passare ogni richiesta dallo scheduler e gestisce i 429."""
+
+    def __init__(self, scheduler, **kwargs):
+        self.scheduler = scheduler
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        scheduler = self.scheduler
+        attempt = 0
+        while True:
+            scheduler.acquire()
+            try:
+                response = super().send(request, **kwargs)
+            except RetryError:
+                scheduler.release()
+                for _ in range(_exhausted_retries(self.max_retries)):
+                    record_http_retry()
+                raise
+            except Exception:
+                scheduler.release()
+                raise
+            # Errori 5xx già ripetuti da urllib3 dentro super().send (Retry di spotify_client)
+            retry_state = getattr(response.raw, "retries", None)
+            for _ in range(len(retry_state.history) if retry_state is not None else 0):
+                record_http_retry()
+            record_http_response(response)
+            if response.status_code != 429:
+                scheduler.release()
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            scheduler.release(throttled=True, retry_after=retry_after)
+            if attempt >= scheduler.max_retries:
+                scheduler.record("giveups")
+                return response
+            response.close()
+            scheduler.record("retries")
+            record_http_retry(throttled=True)
+            # Retry-After blocca tutto il processo; il jitter sfalsa la ripartenza dei retry
+            time.sleep(retry_after + scheduler.backoff_delay(attempt))
+            attempt += 1
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Scheduler unico del processo, condiviso da tutti i client Spotify."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
@@ -0,0 +1,268 @@
+import atexit
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+from analysis_model import LOW_SCORE_THRESHOLD
+from duplicate_index import DUPLICATE_RULES
+from lean_fetch import dumps, loads
+
+# --- ARCHIVIO DEI RISULTATI DI SESSIONE: RECORD COMPATTI E BUDGET DI MEMORIA ---
+
+DEFAULT_MEMORY_BUDGET_MB = 256 # Memoria complessiva dei risultati tenuti in RAM dal processo
+DEFAULT_SPILL_TTL_SECONDS = 24 * 60 * 60 # I risultati su disco più vecchi vengono eliminati
+
+# Codici della colonna duplicati: 0 non duplicato, 1 duplicato senza regola nota, poi le regole
+_DUPLICATE_CODES = (None, None) + DUPLICATE_RULES
+
+
+class CompactTracks:
+    """Lista dei brani di un risultato memorizzata per colonne.
+
+    Posizioni, score e duplicati stanno in array di tipi primitivi; gli artisti sono
+    codici in una tabella di nomi internati, così ogni artista è memorizzato una volta
+    sola. Si comporta come la lista di dict `all_tracks_data`: `len`, iterazione, indici
+    e slice restituiscono dict creati al momento, solo per le righe richieste.
+    """
+
+    __slots__ = ("positions", "scores", "duplicate_codes", "names", "artist_codes", "artists", "nbytes")
+
+    def __init__(self, records):
+        artist_index = {}
+        self.positions = array("i")
+        self.scores = array("b")
+        self.duplicate_codes = bytearray()
+        self.names = []
+        self.artist_codes = array("I")
+        for record in records:
+            self.positions.append(record['position'])
+            self.scores.append(record['score'])
+            rule = record.get('duplicate_rule')
+            self.duplicate_codes.append(
+                _DUPLICATE_CODES.index(rule, 2) if rule else int(bool(record['is_duplicate']))
+            )
+            self.names.append(record['name'])
+            self.artist_codes.append(artist_index.setdefault(sys.intern(record['artist']), len(artist_index)))
+        self.artists = list(artist_index)
+        self._measure()
+
+    def to_columns(self):
+        """Colonne serializzabili in JSON (formato dei risultati scaricati su disco)."""
+        return {
+            "positions": self.positions.tolist(),
+            "scores": self.scores.tolist(),
+            "duplicate_codes": list(self.duplicate_codes),
+            "names": self.names,
+            "artist_codes": self.artist_codes.tolist(),
+            "artists": self.artists,
+        }
+
+    @classmethod
+    def from_columns(cls, columns):
+        tracks = cls.__new__(cls)
+        tracks.positions = array("i", columns["positions"])
+        tracks.scores = array("b", columns["scores"])
+        tracks.duplicate_codes = bytearray(columns["duplicate_codes"])
+        tracks.names = columns["names"]
+        tracks.artist_codes = array("I", columns["artist_codes"])
+        tracks.artists = [sys.intern(artist) for artist in columns["artists"]]
+        tracks._measure()
+        return tracks
+
+    def _measure(self):
+        self.nbytes = (
+            sum(sys.getsizeof(column) for column in (self.positions, self.scores, self.duplicate_codes,
+                                                    self.names, self.artist_codes, self.artists))
+            + sum(sys.getsizeof(name) for name in self.names)
+            + sum(sys.getsizeof(artist) for artist in self.artists)
+        )
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _record(self, index):
+        code = self.duplicate_codes[index]
+        return {
+            "position": self.positions[index],
+            "name": self.names[index],
+            "artist": self.artists[self.artist_codes[index]],
+            "score": self.scores[index],
+            "is_duplicate": code > 0,
+            "duplicate_rule": _DUPLICATE_CODES[code],
+        }
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._record(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("indice brano fuori intervallo")
+        return self._record(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._record(index)
+
+    def low_score_tracks(self, threshold=LOW_SCORE_THRESHOLD):
+        """Brani sotto la soglia: maschera vettoriale sulla colonna degli score, dict solo per quelli."""
+        low_mask = np.frombuffer(self.scores, dtype=np.int8) < threshold
+        return [self._record(int(index)) for index in np.flatnonzero(low_mask)]
+
+
+def _private_spill_dir(spill_dir):
+    """Directory dei risultati su disco leggibile e scrivibile solo dall'utente del processo.
+
+    Senza percorso ne crea una nuova con nome non prevedibile (mkdtemp, permessi 0700),
+    rimossa all'uscita del processo. Un percorso configurato deve essere una directory
+    dell'utente corrente senza permessi per gruppo e altri utenti.
+    """
+    if spill_dir is None:
+        spill_dir = tempfile.mkdtemp(prefix="playlist_analyzer_results_")
+        atexit.register(shutil.rmtree, spill_dir, ignore_errors=True)
+        return spill_dir
+    os.makedirs(spill_dir, mode=0o700, exist_ok=True)
+    info = os.lstat(spill_dir)
+    if (not stat.S_ISDIR(info.st_mode) or info.st_mode & 0o077
+            or (hasattr(os, "getuid") and info.st_uid != os.getuid())):
+        raise PermissionError(f"La directory dei risultati deve appartenere all'utente con permessi 0700: {spill_dir}")
+    return spill_dir
+
+
+class ResultStore:
+    """Risultati delle analisi condivisi dal processo, entro un budget di memoria.
+
+    Le sessioni conservano solo l'ID del risultato. Oltre `memory_budget_bytes` i risultati
+    usati meno di recente vengono scritti su disco e rimossi dalla RAM; `get` li ricarica
+    in modo trasparente. Il risultato più recente resta sempre in memoria. Il budget conta
+    le colonne dei brani e il riepilogo (metriche, sketch, ...); su disco i risultati sono
+    JSON in una directory privata (vedi _private_spill_dir), mai oggetti eseguibili.
+    """
+
+    def __init__(self, memory_budget_bytes=DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024, spill_dir=None,
+                 spill_ttl_seconds=DEFAULT_SPILL_TTL_SECONDS):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.spill_dir = _private_spill_dir(spill_dir)
+        self.spill_ttl_seconds = spill_ttl_seconds
+        self.memory_bytes = 0
+        self.spills = 0
+        self.reloads = 0
+        self._entries = OrderedDict() # result_id -> (riepilogo, CompactTracks, byte stimati)
+        self._on_disk = set()
+        self._lock = threading.Lock()
+
+    def _spill_path(self, result_id):
+        if not result_id.isalnum():
+            raise ValueError(f"ID risultato non valido: {result_id!r}")
+        return os.path.join(self.spill_dir, f"{result_id}.json")
+
+    def put(self, result_id, data):
+        """Salva il risultato in forma compatta con l'ID indicato (se non è già presente)."""
+        with self._lock:
+            if result_id in self._entries:
+                self._entries.move_to_end(result_id)
+                return result_id
+            summary = {key: value for key, value in data.items() if key != 'all_tracks_data'}
+            self._add(result_id, summary, CompactTracks(data['all_tracks_data']))
+        return result_id
+
+    def get(self, result_id):
+        """Risultato come dict con `all_tracks_data` compatto, o None se non più disponibile."""
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is not None:
+                self._entries.move_to_end(result_id)
+            else:
+                try:
+                    with open(self._spill_path(result_id), "rb") as f:
+                        spilled = loads(f.read())
+                    summary, tracks = spilled["summary"], CompactTracks.from_columns(spilled["tracks"])
+                except (OSError, ValueError, KeyError, TypeError):
+                    return None
+                self.reloads += 1
+                self._on_disk.add(result_id)
+                self._touch(result_id)
+                entry = self._add(result_id, summary, tracks)
+            summary, tracks, _ = entry
+        return dict(summary, all_tracks_data=tracks)
+
+    def _add(self, result_id, summary, tracks):
+        # Il riepilogo si stima con la sua dimensione in JSON: metriche e sketch non sono trascurabili
+        entry = (summary, tracks, tracks.nbytes + len(dumps(summary)))
+        self._entries[result_id] = entry
+        self.memory_bytes += entry[2]
+        # Scarica su disco i risultati meno recenti finché non si rientra nel budget
+        while self.memory_bytes > self.memory_budget_bytes and len(self._entries) > 1:
+            old_id, (old_summary, old_tracks, old_bytes) = self._entries.popitem(last=False)
+            self.memory_bytes -= old_bytes
+            self._spill(old_id, old_summary, old_tracks)
+        return entry
+
+    def _spill(self, result_id, summary, tracks):
+        path = self._spill_path(result_id)
+        # Già scritto a una precedente espulsione e mai modificato: basta aggiornarne la data
+        if result_id in self._on_disk and self._touch(result_id):
+            return
+        self._prune_disk()
+        with open(path + ".tmp", "wb") as f:
+            f.write(dumps({"summary": summary, "tracks": tracks.to_columns()}))
+        os.replace(path + ".tmp", path)
+        self._on_disk.add(result_id)
+        self.spills += 1
+
+    def _touch(self, result_id):
+        """Segna come appena usato il file del risultato (la data che conta per _prune_disk)."""
+        try:
+            os.utime(self._spill_path(result_id))
+            return True
+        except OSError:
+            self._on_disk.discard(result_id)
+            return False
+
+    def _prune_disk(self):
+        """Elimina i risultati su disco non usati (scritti, ricaricati o espulsi) da `spill_ttl_seconds`."""
+        cutoff = time.time() - self.spill_ttl_seconds
+        for entry in os.scandir(self.spill_dir):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    self._on_disk.discard(entry.name.split(".")[0])
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_memory": len(self._entries),
+                "memory_bytes": self.memory_bytes,
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "spills": self.spills,
+                "reloads": self.reloads,
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_result_store():
+    """Archivio unico del processo.
+
+    Il budget si imposta con ANALYZER_RESULT_BUDGET_MB; ANALYZER_RESULT_SPILL_DIR indica una
+    directory privata per i risultati su disco (default: una nuova directory temporanea).
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            budget_mb = float(os.environ.get("ANALYZER_RESULT_BUDGET_MB", DEFAULT_MEMORY_BUDGET_MB))
+            _store = ResultStore(memory_budget_bytes=int(budget_mb * 1024 * 1024),
+                                 spill_dir=os.environ.get("ANALYZER_RESULT_SPILL_DIR"))
+        return _store
@@ -0,0 +1,83 @@
+import os
+import threading
+
+import requests
+import spotipy
+from spotipy.cache_handler import MemoryCacheHandler
+from spotipy.oauth2 import SpotifyClientCredentials
+from urllib3.util.retry import Retry
+
+from request_scheduler import ScheduledHTTPAdapter, get_scheduler
+
+# --- CLIENT SPOTIFY CONDIVISO (TOKEN + POOL DI CONNESSIONI KEEP-ALIVE) ---
+
+DEFAULT_POOL_SIZE = 16 # Connessioni keep-alive verso api.spotify.com
+
+# Endpoint sovrascrivibili da ambiente, es. per puntare a un'API Spotify finta in locale
+DEFAULT_API_BASE_URL = "https://api.spotify.com/v1/"
+DEFAULT_TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class _LockedClientCredentials(SpotifyClientCredentials):
+    """Credenziali client con token in memoria e rinnovo serializzato tra i thread."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._token_lock = threading.Lock()
+
+    def get_access_token(self, *args, **kwargs):
+        # Il token resta in cache finché non scade; un solo thread alla volta lo rinnova
+        with self._token_lock:
+            return super().get_access_token(*args, **kwargs)
+
+
+def _build_session(pool_size):
+    """Sessione keep-alive le cui richieste passano tutte dallo scheduler del processo.
+
+    Le risposte 429 sono gestite dallo scheduler (Retry-After, backoff con jitter); urllib3
+    ripete solo gli errori 5xx, come fa spotipy con la sua sessione predefinita.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        connect=None,
+        read=False,
+        allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+        status=3,
+        backoff_factor=0.3,
+        status_forcelist=(500, 502, 503, 504),
+        respect_retry_after_header=False
+    )
+    adapter = ScheduledHTTPAdapter(get_scheduler(), pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_spotify_client(client_id, client_secret, pool_size=DEFAULT_POOL_SIZE):
+    """Restituisce il client Spotify del processo per queste credenziali.
+
+    Il client viene creato una sola volta e riutilizzato da tutte le sessioni e i rerun:
+    il token viene richiesto solo alla scadenza e le connessioni HTTP restano aperte.
+    Gli endpoint si possono cambiare con SPOTIFY_API_BASE_URL e SPOTIFY_TOKEN_URL.
+    """
+    api_base_url = os.environ.get("SPOTIFY_API_BASE_URL", DEFAULT_API_BASE_URL)
+    token_url = os.environ.get("SPOTIFY_TOKEN_URL", DEFAULT_TOKEN_URL)
+    key = (client_id, client_secret, pool_size, api_base_url, token_url)
+    with _clients_lock:
+        sp = _clients.get(key)
+        if sp is None:
+            auth_manager = _LockedClientCredentials(
+                client_id=client_id,
+                client_secret=client_secret,
+                cache_handler=MemoryCacheHandler(),
+                requests_session=_build_session(pool_size)
+            )
+            auth_manager.OAUTH_TOKEN_URL = token_url
+            sp = spotipy.Spotify(auth_manager=auth_manager, requests_session=_build_session(pool_size))
+            sp.prefix = api_base_url
+            _clients[key] = sp
+        return sp
@@ -0,0 +1,17 @@
+import contextlib
+import sqlite3
+
+# --- CONNESSIONI SQLITE CONDIVISE DA CACHE, INDICI E STORICO ---
+
+DEFAULT_TIMEOUT_SECONDS = 30 # Attesa massima del lock del database tra processi e thread
+
+
+@contextlib.contextmanager
+def connect(path, timeout=DEFAULT_TIMEOUT_SECONDS):
+    """Connessione breve per operazione: commit a fine blocco, chiusura sempre."""
+    conn = sqlite3.connect(path, timeout=timeout)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
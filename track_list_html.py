@@ -0,0 +1,73 @@
+import html
+
+# --- GENERAZIONE HTML DELLE LISTE BRANI (SENZA DIPENDENZE DA STREAMLIT) ---
+
+def get_score_classes(score):
+    """Determina le classi CSS per lo score in base a 9 intervalli."""
+    if score >= 90:
+        return 'fill-c9-bg', 'bar-c9'
+    elif score >= 78:
+        return 'fill-c8-bg', 'bar-c8'
+    elif score >= 67:
+        return 'fill-c7-bg', 'bar-c7'
+    elif score >= 56:
+        return 'fill-c6-bg', 'bar-c6'
+    elif score >= 45:
+        return 'fill-c5-bg', 'bar-c5'
+    elif score >= 34:
+        return 'fill-c4-bg', 'bar-c4'
+    elif score >= 23:
+        return 'fill-c3-bg', 'bar-c3'
+    elif score >= 12:
+        return 'fill-c2-bg', 'bar-c2'
+    else:
+        return 'fill-c1-bg', 'bar-c1'
+
+# Frammenti di classe precalcolati per ogni score 0-100: evitano la catena if/elif per brano
+_SCORE_STYLE_TABLE = [
+    get_score_classes(score) + (max(score, 3), 'low-track-name' if score < 20 else '')
+    for score in range(101)
+]
+
+# Etichetta mostrata accanto a DUPLICATO per la regola che ha individuato il duplicato
+_DUPLICATE_RULE_LABELS = {"isrc": " · ISRC", "title_artist": " · TITOLO/ARTISTA"}
+
+TRACK_LIST_HEADER = (
+    '<div class="track-list-header">'
+    '<span style="text-align: right;">POS.</span>'
+    '<span style="margin-left: 10px;">SONG / ARTIST</span>'
+    '<span style="text-align: right;">SCORE</span>'
+    '</div>'
+)
+
+# Riga su una sola linea: un blocco HTML markdown si interrompe alle righe vuote
+_TRACK_ROW_TEMPLATE = (
+    '<div class="track-item-clean %s">'
+    '<span class="track-index">#%d</span>'
+    '<div class="track-name-artist">'
+    '<span class="%s">%s%s</span> <br> <i style=\'color:#a0a0b0\'>%s</i>'
+    '</div>'
+    '<div class="score-container-detail">'
+    '<div class="score-bar-small"><div class="score-bar-fill %s" style="width: %d%%;"></div></div>'
+    '<span class="track-score-value-clean %s">%d</span>'
+    '</div>'
+    '</div>'
+)
+
+def build_track_rows_html(tracks):
+    """Costruisce in blocco il markup di tutte le righe come un'unica stringa."""
+    table = _SCORE_STYLE_TABLE
+    escape = html.escape
+    rows = []
+    for track in tracks:
+        score = track['score']
+        score_class, bar_color, bar_width, name_class = table[min(max(score, 0), 100)]
+        if track.get('is_duplicate'):
+            rule_label = _DUPLICATE_RULE_LABELS.get(track.get('duplicate_rule'), "")
+            row_class, text_class, tag = "is-duplicate", "duplicate-name", f" (DUPLICATO{rule_label})"
+        else:
+            row_class, text_class, tag = "", name_class, ""
+        rows.append((row_class, track['position'], text_class, escape(track['name']), tag,
+                     escape(track['artist']), bar_color, bar_width, score_class, score))
+    template = _TRACK_ROW_TEMPLATE
+    return "".join([template % row for row in rows])